@@ -1,29 +1,53 @@
 
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, make_response, Response
 import sqlite3
+import atexit
+import os
+import db
+import passwords
+from page_cache import PageCache
+from events import Broker, stream
+from write_behind import WriteBehindQueue
 
 app = Flask(__name__)
 app.secret_key = 'sih2025'
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('farmers.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS queries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    query TEXT NOT NULL,
-                    response TEXT,
-                    FOREIGN KEY(user_id) REFERENCES users(id))''')
-    conn.commit()
-    conn.close()
-
-init_db()
+db.init_db()
+atexit.register(db.close_all)
+
+@app.teardown_appcontext
+def release_db(exc):
+    # Hand this request's connection back to the pool
+    db.release()
+
+# Optional write-behind mode: submissions and responses are committed in
+# batches by a background writer (FARMERS_WRITE_BEHIND=1)
+writer = None
+if os.environ.get('FARMERS_WRITE_BEHIND') == '1':
+    writer = WriteBehindQueue(
+        flush_interval=float(os.environ.get('FARMERS_WRITE_BEHIND_MS', '50')) / 1000,
+        max_batch=int(os.environ.get('FARMERS_WRITE_BEHIND_ROWS', '500')))
+    atexit.register(writer.close)  # runs before db.close_all
+
+# Rendered dashboard pages, shared by every expert and per farmer
+dashboard_cache = PageCache()
+
+# Opt-in instrumentation: per-route/per-SQL timings on /metrics and a log
+# line for every request slower than FARMERS_SLOW_MS
+if os.environ.get('FARMERS_METRICS') == '1':
+    import metrics
+    metrics.install(app, slow_ms=float(os.environ.get('FARMERS_SLOW_MS', '500')))
+
+# Live updates pushed to /events streams
+broker = Broker()
+
+def write(sql, params, on_commit=None):
+    if writer:
+        writer.submit(sql, params, session['user'], on_commit)
+    else:
+        lastrowid = db.execute(sql, params)
+        if on_commit:
+            on_commit(lastrowid)
 
 # Home Page
 @app.route('/')
@@ -38,11 +62,8 @@ def register():
         password = request.form['password']
         role = request.form['role']  # farmer or expert
         try:
-            conn = sqlite3.connect('farmers.db', check_same_thread=False)
-            c = conn.cursor()
-            c.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)", (username, password, role))
-            conn.commit()
-            conn.close()
+            db.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)",
+                       (username, passwords.hash_password_pooled(password), role))
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             return "Username already exists!"
@@ -54,16 +75,24 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        conn = sqlite3.connect('farmers.db', check_same_thread=False)
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = c.fetchone()
-        conn.close()
-        if user:
+        if passwords.limiter.is_blocked(username):
+            return "Too many failed attempts, try again later", 429
+        user = db.query("SELECT * FROM users WHERE username=?", (username,), one=True)
+        if user is None:
+            ok = passwords.check_unknown_user(password)  # same scrypt cost as a real check
+        else:
+            ok = passwords.check_password(password, user[2])
+        if ok:
+            passwords.limiter.reset(username)
+            if passwords.needs_rehash(user[2]):
+                # Upgrade plaintext or outdated hashes in place
+                db.execute("UPDATE users SET password=? WHERE id=?",
+                           (passwords.hash_password_pooled(password), user[0]))
             session['user'] = user[0]
             session['role'] = user[3]
             return redirect(url_for('dashboard'))
         else:
+            passwords.limiter.record_failure(username)
             return "Invalid Credentials"
     return render_template('login.html')
 
@@ -72,39 +101,81 @@ def login():
 def dashboard():
     if 'user' not in session:
         return redirect(url_for('login'))
-    conn = sqlite3.connect('farmers.db', check_same_thread=False)
-    c = conn.cursor()
-    if session['role'] == 'farmer':
-        c.execute("SELECT * FROM queries WHERE user_id=?", (session['user'],))
-    else:  # expert
-        c.execute("SELECT * FROM queries")
-    queries = c.fetchall()
-    conn.close()
-    return render_template('dashboard.html', queries=queries, role=session['role'])
+    if writer:
+        # Read-your-writes: wait for this user's queued writes to land
+        writer.wait_for(session['user'])
+    unanswered_only = request.args.get('unanswered') == '1'
+    cursor = request.args.get('cursor')
+    role = session['role']
+    # Experts all see the same listing, farmers only their own
+    owner = session['user'] if role == 'farmer' else None
+    version = db.queries_version()
+    # Keyed on the parsed cursor, so junk cursors all share the first page's
+    # entry and never reach the ETag
+    key = (version, role, owner, unanswered_only) + db.parse_cursor(cursor)
+    etag = '-'.join(str(part) for part in key)
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': '"%s"' % etag}
+
+    page = dashboard_cache.get(key)
+    if page is None:
+        queries, next_cursor = db.list_queries(owner, unanswered_only, cursor)
+        page = render_template('dashboard.html', queries=queries, role=role,
+                               next_cursor=next_cursor, unanswered_only=unanswered_only)
+        dashboard_cache.put(key, page)
+    response = make_response(page)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Search previously asked questions and answers
+@app.route('/search')
+def search():
+    if 'user' not in session:
+        return redirect(url_for('login'))
+    text = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    # Same visibility as the dashboard: farmers only search their own questions
+    owner = session['user'] if session['role'] == 'farmer' else None
+    results, has_more = db.search_queries(text, page, owner=owner)
+    return render_template('search.html', results=results, q=text, page=page,
+                           has_more=has_more, role=session['role'])
 
 # Submit Query
 @app.route('/submit_query', methods=['POST'])
 def submit_query():
     query_text = request.form['query']
     user_id = session['user']
-    conn = sqlite3.connect('farmers.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute("INSERT INTO queries (user_id, query, response) VALUES (?,?,?)", (user_id, query_text, ''))
-    conn.commit()
-    conn.close()
+    write("INSERT INTO queries (user_id, query, response) VALUES (?,?,?)", (user_id, query_text, ''),
+          lambda query_id: broker.publish({'type': 'query', 'query_id': query_id,
+                                           'user_id': user_id, 'query': query_text}))
     return redirect(url_for('dashboard'))
 
 # Respond to Query
 @app.route('/respond/<int:query_id>', methods=['POST'])
 def respond(query_id):
     response_text = request.form['response']
-    conn = sqlite3.connect('farmers.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute("UPDATE queries SET response=? WHERE id=?", (response_text, query_id))
-    conn.commit()
-    conn.close()
+
+    def published(_):
+        if not len(broker):
+            return
+        owner = db.query("SELECT user_id FROM queries WHERE id=?", (query_id,), one=True)
+        if owner:
+            broker.publish({'type': 'response', 'query_id': query_id,
+                            'user_id': owner[0], 'response': response_text})
+
+    write("UPDATE queries SET response=? WHERE id=?", (response_text, query_id), published)
     return redirect(url_for('dashboard'))
 
+# Live updates (server-sent events) instead of reloading the dashboard
+@app.route('/events')
+def events():
+    if 'user' not in session:
+        return "Login required", 401
+    sub = broker.subscribe(session['user'], session['role'])
+    return Response(stream(broker, sub), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Logout
 @app.route('/logout')
 def logout():
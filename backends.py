@@ -0,0 +1,93 @@
+# Inference backends for the crop-health model
+#
+# load_model(path) returns an object with predict_on_batch(batch) for either
+# the original Keras .h5 model or an exported .tflite artifact (see
+# model_export.py). TFLite uses the small tflite_runtime package when it is
+# installed and falls back to tf.lite otherwise, so hosts serving the
+# quantized model don't need full TensorFlow.
+import os
+
+import numpy as np
+
+# Largest batch a TFLite interpreter is sized for; bigger batches are split
+MAX_BATCH = int(os.environ.get('CROP_BATCH_SIZE', '32'))
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, path):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(path)
+
+    def predict_on_batch(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """TFLite interpreter; not thread-safe, so call it from one thread (the MicroBatcher worker).
+
+    Batches are zero-padded up to a power of two (capped at max_batch) and
+    each of those sizes gets its own interpreter, allocated once on first
+    use, so steady traffic never resizes or reallocates tensors.
+    """
+    name = 'tflite'
+
+    def __init__(self, path, num_threads=None, max_batch=MAX_BATCH):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self._open = lambda: Interpreter(model_path=path, num_threads=num_threads or os.cpu_count())
+        self.max_batch = max_batch
+        self._buckets = {}  # batch size -> (interpreter, input details, output details)
+        self._bucket(1)
+
+    def _bucket(self, size):
+        bucket = self._buckets.get(size)
+        if bucket is None:
+            # Exported models have a fixed batch dimension; set it for this size
+            interpreter = self._open()
+            details = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(details['index'], [size] + list(details['shape'][1:]))
+            interpreter.allocate_tensors()
+            bucket = self._buckets[size] = (interpreter, interpreter.get_input_details()[0],
+                                            interpreter.get_output_details()[0])
+        return bucket
+
+    def predict_on_batch(self, batch):
+        if len(batch) > self.max_batch:
+            return np.concatenate([self.predict_on_batch(batch[i:i + self.max_batch])
+                                   for i in range(0, len(batch), self.max_batch)])
+        n = len(batch)
+        size = min(1 << (n - 1).bit_length(), self.max_batch)
+        interpreter, input_details, output_details = self._bucket(size)
+        scale, zero_point = input_details['quantization']
+        if scale:
+            # Fully integer-quantized input
+            limits = np.iinfo(input_details['dtype'])
+            batch = np.clip(np.round(batch / scale + zero_point), limits.min, limits.max)
+        batch = batch.astype(input_details['dtype'], copy=False)
+        if n < size:
+            # The padded rows' outputs are dropped below
+            padded = np.zeros((size,) + batch.shape[1:], dtype=batch.dtype)
+            padded[:n] = batch
+            batch = padded
+        interpreter.set_tensor(input_details['index'], batch)
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index'])[:n]
+        scale, zero_point = output_details['quantization']
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+def load_model(path, backend=None):
+    """Load `path` with the named backend, or pick one from the file extension."""
+    backend = backend or ('tflite' if path.endswith('.tflite') else 'keras')
+    if backend == 'tflite':
+        return TFLiteBackend(path)
+    if backend == 'keras':
+        return KerasBackend(path)
+    raise ValueError("unknown backend %r" % backend)
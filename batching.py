@@ -0,0 +1,85 @@
+# Dynamic micro-batching for model inference
+#
+# Request threads submit their preprocessed tensor and wait on a Future. One
+# worker thread collects queued inputs until it has max_batch_size images or
+# the oldest has waited max_wait_ms, runs a single batched predict over all
+# of them and hands each caller back its own slice of the output.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ('inputs', 'future')
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.future = Future()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=10):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs):
+        """Queue a batch of inputs shaped (n, ...); returns a Future of the n predictions."""
+        request = _Request(inputs)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, inputs, timeout=None):
+        return self.submit(inputs).result(timeout)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        size = len(first.inputs)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            size += len(item.inputs)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if not batch:
+                continue
+            try:
+                inputs = batch[0].inputs if len(batch) == 1 else np.concatenate([r.inputs for r in batch])
+                outputs = np.asarray(self.predict_fn(inputs))
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            offset = 0
+            for request in batch:
+                n = len(request.inputs)
+                request.future.set_result(outputs[offset:offset + n])
+                offset += n
@@ -0,0 +1,213 @@
+# Load test for the farmers Q&A app (app.py)
+#
+# USAGE:
+#     python bench_app.py [--users 1000] [--queries 50000] [--clients 16] [--seconds 20]
+#                         [--write-behind] [--json results.json] [--baseline old.json]
+#
+# Seeds a temporary farmers.db, serves app.py over real HTTP on a local port
+# and drives it with concurrent simulated farmers and experts. Every client
+# registers and logs in, then loops over dashboard / submit_query (farmers)
+# or dashboard / respond (experts). Latency p50/p95/p99 and throughput are
+# reported per route. With --baseline, the run fails (exit 1) if any route's
+# p95 is more than --tolerance slower than the saved baseline.
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+# Minimal templates used when the app's own templates/ folder is missing
+FALLBACK_TEMPLATES = {
+    'home.html': 'home',
+    'login.html': 'login',
+    'register.html': 'register',
+    'dashboard.html': '{% for q in queries %}<p>{{ q[2] }} {{ q[3] }}</p>{% endfor %}',
+    'search.html': '{% for q in results %}<p>{{ q[2] }}</p>{% endfor %}',
+}
+
+
+def seed(path, users, queries, password_hash):
+    import db
+    from farmers_cli import import_rows
+    db.configure(path)
+    db.init_db()
+    # Half the seeded accounts are experts; all share one pre-hashed password
+    import_rows('users', ({'username': f'seed{i}', 'password': password_hash,
+                           'role': 'expert' if i % 2 else 'farmer'} for i in range(users)))
+    import_rows('queries', ({'user_id': random.randint(1, users), 'query': f'seed question {i}',
+                             'response': '' if i % 2 else 'seed answer'} for i in range(queries)))
+    db.close_all()
+
+
+def start_server():
+    from jinja2 import ChoiceLoader, DictLoader
+    from werkzeug.serving import make_server
+    import app
+    app.app.jinja_loader = ChoiceLoader([app.app.jinja_loader, DictLoader(FALLBACK_TEMPLATES)])
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app, server, 'http://127.0.0.1:%d' % server.server_port
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time each hop on its own; the 302 after a POST is the route's answer
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    def __init__(self, base, stats):
+        self.base = base
+        self.stats = stats
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+    def call(self, route, path, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        start = time.perf_counter()
+        try:
+            with self.opener.open(self.base + path, data=data, timeout=30) as resp:
+                resp.read()
+                ok = resp.status < 400
+        except urllib.error.HTTPError as e:
+            e.read()
+            ok = e.code < 400
+        except OSError:
+            ok = False
+        self.stats.record(route, time.perf_counter() - start, ok)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def report(self, elapsed):
+        results = {}
+        for route, samples in sorted(self.latencies.items()):
+            samples.sort()
+            pct = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+            results[route] = {
+                'count': len(samples),
+                'errors': self.errors[route],
+                'rps': len(samples) / elapsed,
+                'p50_ms': pct[49] * 1000,
+                'p95_ms': pct[94] * 1000,
+                'p99_ms': pct[98] * 1000,
+            }
+        return results
+
+
+def simulate(base, stats, index, role, query_count, deadline):
+    client = Client(base, stats)
+    username = f'bench{index}_{random.randrange(10 ** 9)}'
+    client.call('register', '/register', {'username': username, 'password': 'pw', 'role': role})
+    client.call('login', '/login', {'username': username, 'password': 'pw'})
+    while time.perf_counter() < deadline:
+        client.call('dashboard', '/dashboard')
+        if role == 'farmer':
+            client.call('submit_query', '/submit_query', {'query': f'bench question from {username}'})
+        else:
+            client.call('respond', '/respond/%d' % random.randint(1, query_count), {'response': 'bench answer'})
+        if random.random() < 0.05:
+            # Returning users log in again now and then
+            client.call('login', '/login', {'username': username, 'password': 'pw'})
+
+
+def print_report(results, elapsed):
+    total = sum(r['count'] for r in results.values())
+    print(f"\n{total:,} requests in {elapsed:.1f}s ({total / elapsed:,.0f} req/s)")
+    print(f"{'route':<14} {'count':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, r in results.items():
+        print(f"{route:<14} {r['count']:>8} {r['errors']:>7} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+def check_baseline(results, path, tolerance):
+    with open(path) as f:
+        baseline = json.load(f)['routes']
+    regressions = []
+    for route, r in results.items():
+        old = baseline.get(route)
+        if old and r['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {old['p95_ms']:.2f}ms -> {r['p95_ms']:.2f}ms")
+    for line in regressions:
+        print("REGRESSION " + line)
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the farmers Q&A app')
+    parser.add_argument('--users', type=int, default=1000, help='seeded accounts')
+    parser.add_argument('--queries', type=int, default=50000, help='seeded queries')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent simulated users')
+    parser.add_argument('--experts', type=float, default=0.25, help='fraction of clients that are experts')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--write-behind', action='store_true')
+    parser.add_argument('--scrypt-log-n', type=int, default=12)
+    parser.add_argument('--json', help='save results to this file')
+    parser.add_argument('--baseline', help='compare against a saved --json file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown vs baseline')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='farmers_app_bench_')
+    # app.py reads these at import time
+    os.environ['FARMERS_DB'] = os.path.join(tmp, 'farmers.db')
+    os.environ['FARMERS_SCRYPT_LOG_N'] = str(args.scrypt_log_n)
+    if args.write_behind:
+        os.environ['FARMERS_WRITE_BEHIND'] = '1'
+    try:
+        import passwords
+        seed(os.environ['FARMERS_DB'], args.users, args.queries, passwords.hash_password('pw'))
+        app, server, base = start_server()
+
+        stats = Stats()
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        threads = [threading.Thread(target=simulate, args=(
+                       base, stats, i, 'expert' if i < args.clients * args.experts else 'farmer',
+                       args.queries, deadline))
+                   for i in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        if app.writer:
+            app.writer.close()
+
+        results = stats.report(elapsed)
+        print(f"{args.clients} clients, {args.users:,} users, {args.queries:,} queries, "
+              f"write-behind={'on' if args.write_behind else 'off'}")
+        print_report(results, elapsed)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'args': vars(args), 'routes': results}, f, indent=2)
+        if args.baseline and not check_baseline(results, args.baseline, args.tolerance):
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Benchmark: per-request sqlite3.connect vs. the pooled WAL access layer in db.py
+#
+# USAGE:
+#     python bench_db.py [--seconds 5] [--readers 8] [--writers 2] [--users 500] [--queries 20000]
+#
+# Each simulated request runs the same single statement a route in app.py runs
+# (dashboard read, submit_query insert, respond update) and the script reports
+# requests/sec for the old "connect, execute, close" pattern and for db.py.
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+
+
+def seed(path, users, queries):
+    db.configure(path)
+    db.init_db()
+    conn = db.get_conn()
+    with conn:
+        conn.executemany("INSERT INTO users (username, password, role) VALUES (?,?,?)",
+                         ((f"user{i}", "pw", "farmer") for i in range(users)))
+        conn.executemany("INSERT INTO queries (user_id, query, response) VALUES (?,?,?)",
+                         ((random.randint(1, users), f"question {i}", '') for i in range(queries)))
+    db.close_all()
+
+
+# Old pattern from app.py: fresh connection, default rollback journal
+def naive_read(path, user_id):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    c = conn.cursor()
+    c.execute("SELECT * FROM queries WHERE user_id=?", (user_id,))
+    c.fetchall()
+    conn.close()
+
+
+def naive_write(path, user_id):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    c = conn.cursor()
+    if random.random() < 0.5:
+        c.execute("INSERT INTO queries (user_id, query, response) VALUES (?,?,?)", (user_id, "new question", ''))
+    else:
+        c.execute("UPDATE queries SET response=? WHERE id=?", ("answer", user_id))
+    conn.commit()
+    conn.close()
+
+
+def pooled_read(path, user_id):
+    db.query("SELECT * FROM queries WHERE user_id=?", (user_id,))
+    db.release()  # as app.py does at the end of each request
+
+
+def pooled_write(path, user_id):
+    if random.random() < 0.5:
+        db.execute("INSERT INTO queries (user_id, query, response) VALUES (?,?,?)", (user_id, "new question", ''))
+    else:
+        db.execute("UPDATE queries SET response=? WHERE id=?", ("answer", user_id))
+    db.release()
+
+
+def run(path, read_fn, write_fn, args):
+    counts = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker(kind, fn):
+        done = 0
+        while time.perf_counter() < deadline:
+            fn(path, random.randint(1, args.users))
+            done += 1
+        with lock:
+            counts[kind] += done
+
+    threads = [threading.Thread(target=worker, args=('read', read_fn)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=('write', write_fn)) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts['read'] / args.seconds, counts['write'] / args.seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-request connections vs. pooled WAL access')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='farmers_bench_')
+    try:
+        before = os.path.join(tmp, 'before.db')
+        after = os.path.join(tmp, 'after.db')
+
+        seed(after, args.users, args.queries)
+        # The "before" database gets the same rows but back on the default journal
+        shutil.copy(after, before)
+        conn = sqlite3.connect(before)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+        print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s each")
+        r, w = run(before, naive_read, naive_write, args)
+        print(f"before (connect per request): {r:10.0f} reads/s {w:8.0f} writes/s {r + w:10.0f} req/s")
+
+        db.configure(after)
+        r2, w2 = run(after, pooled_read, pooled_write, args)
+        db.close_all()
+        print(f"after  (pooled WAL):          {r2:10.0f} reads/s {w2:8.0f} writes/s {r2 + w2:10.0f} req/s")
+        print(f"speedup: {(r2 + w2) / max(r + w, 1):.2f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Benchmark: old save-then-imread upload path vs. in-memory imdecode
+#
+# USAGE:
+#     python bench_decode.py [--width 1920] [--height 1080] [--iterations 200]
+#
+# Encodes a synthetic field photo as JPEG, then times what /analyze used to
+# do per request (write the upload to disk, cv2.imread it back) against
+# decoding straight from the upload buffer, and prints the saving.
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+
+def synthetic_jpeg(width, height):
+    # Smooth gradients plus noise compress roughly like a real photo
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2])
+    image += np.random.normal(0, 12, image.shape)
+    ok, encoded = cv2.imencode('.jpg', np.clip(image, 0, 255).astype(np.uint8))
+    return encoded.tobytes()
+
+
+def via_disk(data, directory):
+    path = os.path.join(directory, 'upload.jpg')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return cv2.imread(path)
+
+
+def in_memory(data):
+    return cv2.imdecode(np.frombuffer(memoryview(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark upload decoding paths')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    data = synthetic_jpeg(args.width, args.height)
+    with tempfile.TemporaryDirectory() as directory:
+        disk = timed(lambda: via_disk(data, directory), args.iterations)
+    memory = timed(lambda: in_memory(data), args.iterations)
+    print(f"{args.width}x{args.height} JPEG, {len(data) / 1024:.0f} KB, median of {args.iterations}")
+    print(f"save + imread: {disk:7.2f} ms")
+    print(f"imdecode:      {memory:7.2f} ms")
+    print(f"saved per request: {disk - memory:.2f} ms ({(disk - memory) / disk:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Benchmark: micro-batched inference throughput vs. latency
+#
+# USAGE:
+#     python bench_inference.py [--model path_to_your_model.h5|model.tflite] [--clients 32]
+#                               [--batch-sizes 1,4,8,16,32] [--wait-ms 10] [--seconds 10]
+#
+# Loads the crop-health model once, then for each max batch size runs
+# --clients concurrent callers, each submitting one preprocessed 224x224
+# image at a time through MicroBatcher, and reports images/sec and per-image
+# latency percentiles. Batch size 1 is the old one-predict-per-request path.
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from backends import load_model
+from batching import MicroBatcher
+
+
+def run(model, batch_size, wait_ms, clients, seconds):
+    batcher = MicroBatcher(model.predict_on_batch, max_batch_size=batch_size, max_wait_ms=wait_ms)
+    image = np.random.rand(1, 224, 224, 3).astype(np.float32)
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        mine = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            batcher.predict(image)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    pct = statistics.quantiles(latencies, n=100, method='inclusive')
+    return len(latencies) / seconds, pct[49] * 1000, pct[94] * 1000, pct[98] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batched crop-health inference')
+    parser.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    parser.add_argument('--backend', choices=('keras', 'tflite'), help='default: from the file extension')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--batch-sizes', default='1,4,8,16,32')
+    parser.add_argument('--wait-ms', type=float, default=10)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.backend)
+    model.predict_on_batch(np.zeros((1, 224, 224, 3), np.float32))  # warm up
+    print(f"{args.clients} concurrent clients, max wait {args.wait_ms} ms")
+    print(f"{'batch':>5} {'images/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for size in (int(s) for s in args.batch_sizes.split(',')):
+        rate, p50, p95, p99 = run(model, size, args.wait_ms, args.clients, args.seconds)
+        print(f"{size:>5} {rate:>9.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
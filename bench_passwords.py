@@ -0,0 +1,59 @@
+# Benchmark: scrypt logins/sec per core at each cost setting
+#
+# USAGE:
+#     python bench_passwords.py [--min-log-n 10] [--max-log-n 16] [--seconds 2]
+#
+# For every log_n the script verifies one stored hash in a loop on a single
+# thread (logins/sec per core) and then on the verification pool
+# (logins/sec for the whole machine), and reports the memory scrypt needs.
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import passwords
+
+
+def per_core(stored, seconds):
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        passwords.verify_password('correct horse', stored)
+        done += 1
+    return done / seconds
+
+
+def all_cores(stored, seconds, workers):
+    deadline = time.perf_counter() + seconds
+
+    def loop(_):
+        done = 0
+        while time.perf_counter() < deadline:
+            passwords.verify_password('correct horse', stored)
+            done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(loop, range(workers))) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scrypt login verification')
+    parser.add_argument('--min-log-n', type=int, default=10)
+    parser.add_argument('--max-log-n', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=2)
+    args = parser.parse_args()
+
+    workers = os.cpu_count() or 1
+    print(f"r={passwords.R} p={passwords.P}, {workers} cores")
+    print(f"{'log_n':>5} {'memory':>8} {'ms/login':>9} {'logins/s/core':>14} {'logins/s total':>15}")
+    for log_n in range(args.min_log_n, args.max_log_n + 1):
+        stored = passwords.hash_password('correct horse', log_n=log_n)
+        single = per_core(stored, args.seconds)
+        total = all_cores(stored, args.seconds, workers)
+        memory = 128 * passwords.R * (1 << log_n) / 2 ** 20
+        print(f"{log_n:>5} {memory:>6.0f}MB {1000 / single:>9.1f} {single:>14.1f} {total:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Benchmark: old per-image float64 preprocessing vs. the float32 batch pipeline
+#
+# USAGE:
+#     python bench_preprocess.py [--batch 32] [--width 1280] [--height 960] [--rounds 20]
+#
+# Times preprocessing one batch of decoded camera images both ways and
+# reports images/sec plus peak extra memory per batch (numpy allocations
+# are visible to tracemalloc).
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from preprocessing import Preprocessor
+
+
+def old_pipeline(images):
+    # What process_image used to do, stacked into a batch for the model
+    return np.concatenate([np.expand_dims(cv2.resize(image, (224, 224)) / 255.0, axis=0)
+                           for image in images])
+
+
+def measure(fn, images, rounds):
+    fn(images)  # warm up caches and the reusable buffer
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(images)
+    rate = rounds * len(images) / (time.perf_counter() - start)
+    tracemalloc.start()
+    fn(images)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rate, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark crop image preprocessing')
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    images = [np.random.randint(0, 256, (args.height, args.width, 3), np.uint8) for _ in range(args.batch)]
+    preprocessor = Preprocessor(max_batch=args.batch)
+    print(f"batch of {args.batch} {args.width}x{args.height} images")
+    for name, fn in (('old float64', old_pipeline), ('float32 batch', preprocessor.batch)):
+        rate, peak = measure(fn, images, args.rounds)
+        print(f"{name:<14} {rate:9.1f} images/s   peak extra memory {peak:7.1f} MB/batch")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Benchmark: crop-health service cold start per loading mode
+#
+# USAGE:
+#     python bench_startup.py [--model path_to_your_model.h5] [--runs 3]
+#
+# For each CROP_LOAD mode, starts a fresh Python process that imports
+# farming_cv2 and reports how long until the Flask app could answer
+# /healthz (import finished) and until /ready turns 200 (model loaded and
+# warmed up).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r'''
+import json, time
+start = time.monotonic()
+import farming_cv2
+serving = time.monotonic() - start
+client = farming_cv2.app.test_client()
+assert client.get('/healthz').status_code == 200
+farming_cv2.model.get()
+ready = time.monotonic() - start
+print(json.dumps({'serving': serving, 'ready': ready, 'status': farming_cv2.model.status()}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure crop-health service cold-start times')
+    parser.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'mode':<11} {'serving s':>10} {'ready s':>9} {'load s':>8} {'warmup s':>9}")
+    for mode in ('eager', 'background', 'lazy'):
+        runs = []
+        for _ in range(args.runs):
+            env = dict(os.environ, CROP_MODEL=args.model, CROP_LOAD=mode)
+            out = subprocess.run([sys.executable, '-c', CHILD], cwd=here, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        median = lambda key: statistics.median(r[key] for r in runs)
+        status = lambda key: statistics.median(r['status'][key] for r in runs)
+        print(f"{mode:<11} {median('serving'):>10.2f} {median('ready'):>9.2f} "
+              f"{status('load_seconds'):>8.2f} {status('warmup_seconds'):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+# Shared SQLite access layer for the farmers Q&A app
+#
+# Connections are long-lived, tuned for WAL and shared through a bounded
+# pool, so routes no longer pay connect/schema-parse cost per request and
+# readers don't block behind the single writer.
+import collections
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+DB_PATH = os.environ.get('FARMERS_DB', 'farmers.db')
+
+# Tuned for a small, read-heavy Q&A workload
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",        # safe with WAL, skips fsync on every commit
+    "PRAGMA mmap_size=268435456",       # 256 MB memory-mapped reads
+    "PRAGMA cache_size=-20000",         # ~20 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",         # wait for the writer lock instead of failing
+)
+
+# sqlite3 keeps compiled statements per connection; a long-lived connection
+# with a roomy cache means each route's SQL is prepared once per connection.
+STATEMENT_CACHE_SIZE = 256
+
+# At most POOL_SIZE connections are open at once. A thread checks one out
+# on first use and hands it back with release() (app.py does this when
+# each request's app context ends) or automatically when the thread exits,
+# so a thread-per-request server reuses the same few tuned connections.
+POOL_SIZE = int(os.environ.get('FARMERS_DB_POOL', '8'))
+POOL_TIMEOUT = float(os.environ.get('FARMERS_DB_POOL_TIMEOUT', '30'))
+
+_local = threading.local()
+_lock = threading.Lock()
+_idle = []                   # checked-in connections, most recently used last
+_waiters = collections.deque()  # threads blocked on a full pool, served in order
+_connections = set()         # every open connection, idle or checked out
+_generation = 0  # bumped by close_all() so threads drop stale connections
+_pid = os.getpid()
+
+# Optional instrumentation hook (see metrics.py), called as
+# tracer(kind, sql, seconds, rows) with kind one of
+# 'connect', 'lock_wait', 'query', 'execute'.
+tracer = None
+
+
+def trace(kind, sql, seconds, rows=0):
+    if tracer is not None:
+        tracer(kind, sql, seconds, rows)
+
+
+def connect(path=None):
+    """Open a new tuned connection (not pooled)."""
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class _Lease:
+    """A thread's checked-out connection; returned to the pool when collected."""
+    __slots__ = ('conn', 'gen', 'pid', 'finalizer', '__weakref__')
+
+
+def _after_fork():
+    # A forked worker must not reuse its parent's connections or locks
+    global _lock, _idle, _waiters, _connections, _pid
+    _lock = threading.Lock()
+    _idle = []
+    _waiters = collections.deque()
+    _connections = set()
+    _pid = os.getpid()
+
+
+def _checkout():
+    with _lock:
+        if _idle:
+            return _idle.pop()
+        if len(_connections) < POOL_SIZE:
+            start = time.perf_counter()
+            conn = connect()
+            trace('connect', None, time.perf_counter() - start)
+            _connections.add(conn)
+            return conn
+        # Full: wait for _checkin() to hand a connection straight to us, so
+        # threads that keep coming back can't starve the ones already waiting
+        slot = [threading.Event(), None]
+        _waiters.append(slot)
+    if slot[0].wait(POOL_TIMEOUT):
+        return slot[1]
+    with _lock:
+        if slot[1] is None:
+            _waiters.remove(slot)
+            raise sqlite3.OperationalError("connection pool exhausted (%d in use)" % POOL_SIZE)
+    return slot[1]
+
+
+def _checkin(conn, gen, pid):
+    if pid != os.getpid():
+        return  # the parent process owns it
+    with _lock:
+        if gen != _generation:
+            conn.close()  # already closed by close_all()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        if _waiters:
+            slot = _waiters.popleft()
+            slot[1] = conn
+            slot[0].set()
+        else:
+            _idle.append(conn)
+
+
+def get_conn():
+    """Return this thread's connection, checking one out of the pool on first use."""
+    lease = getattr(_local, 'lease', None)
+    if lease is not None and lease.pid == os.getpid() and lease.gen == _generation:
+        return lease.conn
+    if _pid != os.getpid():
+        _after_fork()
+    lease = _Lease()
+    lease.conn, lease.gen, lease.pid = _checkout(), _generation, os.getpid()
+    # Thread-local values are dropped when their thread exits, which
+    # hands the connection back even if release() is never called
+    lease.finalizer = weakref.finalize(lease, _checkin, lease.conn, lease.gen, lease.pid)
+    _local.lease = lease
+    return lease.conn
+
+
+def release():
+    """Return this thread's connection to the pool (no-op if it has none)."""
+    lease = getattr(_local, 'lease', None)
+    if lease is not None:
+        _local.lease = None
+        lease.finalizer()
+
+
+def configure(path):
+    """Point the pool at another database file (used by benchmarks/tools)."""
+    global DB_PATH
+    close_all()
+    DB_PATH = path
+
+
+def close_all():
+    """Close every pooled connection, e.g. on shutdown."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        _connections.clear()
+        _idle.clear()
+
+
+def query(sql, params=(), one=False):
+    """Run a read statement and return all rows (or the first with one=True)."""
+    conn = get_conn()
+    if tracer is None:
+        cur = conn.execute(sql, params)
+        return cur.fetchone() if one else cur.fetchall()
+    start = time.perf_counter()
+    cur = conn.execute(sql, params)
+    result = cur.fetchone() if one else cur.fetchall()
+    rows = (result is not None) if one else len(result)
+    trace('query', sql, time.perf_counter() - start, rows)
+    return result
+
+
+def execute(sql, params=()):
+    """Run a single write statement and commit; returns lastrowid."""
+    conn = get_conn()
+    start = time.perf_counter()
+    with conn:
+        # Take the writer lock up front so waiting for it is measured
+        # separately from the statement itself
+        conn.execute("BEGIN IMMEDIATE")
+        locked = time.perf_counter()
+        cur = conn.execute(sql, params)
+    trace('lock_wait', sql, locked - start)
+    trace('execute', sql, time.perf_counter() - locked, cur.rowcount)
+    return cur.lastrowid
+
+
+# Database setup
+def init_db():
+    conn = get_conn()
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT NOT NULL UNIQUE,
+                        password TEXT NOT NULL,
+                        role TEXT NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS queries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        query TEXT NOT NULL,
+                        response TEXT,
+                        FOREIGN KEY(user_id) REFERENCES users(id))''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queries_user ON queries(user_id)")
+        # Small partial index covering only the unanswered backlog
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queries_unanswered ON queries(id) WHERE response = ''")
+        # Older rows may carry NULL; the listing treats '' as "unanswered"
+        conn.execute("UPDATE queries SET response='' WHERE response IS NULL")
+        init_version(conn)
+        init_search(conn)
+
+
+# Change counter for the queries table
+#
+# Bumped by triggers on every write, so each worker process (and the
+# write-behind thread) invalidates cached dashboard pages the moment a
+# submission or response commits.
+def init_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS queries_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    version INTEGER NOT NULL)''')
+    conn.execute("INSERT OR IGNORE INTO queries_version (id, version) VALUES (0, 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS queries_version_%s AFTER %s ON queries BEGIN
+                        UPDATE queries_version SET version = version + 1 WHERE id = 0;
+                        END''' % (event.lower(), event))
+
+
+def queries_version():
+    return query("SELECT version FROM queries_version WHERE id = 0", one=True)[0]
+
+
+# Query listing
+#
+# Keyset (cursor) pagination: unanswered queries first, newest first within
+# each group. A cursor is 'u<id>' or 'a<id>' -- the group and id of the last
+# row on the previous page -- so every page is an index range scan no matter
+# how deep the user has paged.
+PAGE_SIZE = 50
+
+UNANSWERED = "response = ''"
+ANSWERED = "response <> ''"
+
+
+def parse_cursor(cursor):
+    """(segment, before id) for a page cursor; anything unrecognised means the first page."""
+    if cursor and cursor[0] in 'ua' and cursor[1:].isascii() and cursor[1:].isdigit():
+        return cursor[0], int(cursor[1:])
+    return 'u', None
+
+
+def _cursor_for(row):
+    return ('u' if row[3] == '' else 'a') + str(row[0])
+
+
+def _segment(condition, user_id, before_id, limit):
+    sql = "SELECT * FROM queries WHERE " + condition
+    params = []
+    if user_id is not None:
+        sql += " AND user_id=?"
+        params.append(user_id)
+    if before_id is not None:
+        sql += " AND id<?"
+        params.append(before_id)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    return query(sql, params)
+
+
+def list_queries(user_id=None, unanswered_only=False, cursor=None, limit=PAGE_SIZE):
+    """Return (rows, next_cursor) for one dashboard page; next_cursor is None on the last page."""
+    segment, before_id = parse_cursor(cursor)
+    rows = []
+    if segment == 'u':
+        rows = _segment(UNANSWERED, user_id, before_id, limit + 1)
+        before_id = None  # answered rows start from the newest
+    if not unanswered_only and len(rows) <= limit:
+        rows += _segment(ANSWERED, user_id, before_id, limit + 1 - len(rows))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, _cursor_for(rows[-1])
+    return rows, None
+
+
+# Full-text search
+#
+# queries_fts is an external-content FTS5 index over queries.query and
+# queries.response; the triggers below keep it in step with every
+# INSERT/UPDATE/DELETE so the index never has to be rebuilt by hand.
+def init_search(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name='queries_fts'").fetchone()
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS queries_fts USING fts5(
+                    query, response, content='queries', content_rowid='id')''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS queries_fts_ai AFTER INSERT ON queries BEGIN
+                    INSERT INTO queries_fts(rowid, query, response) VALUES (new.id, new.query, new.response);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS queries_fts_ad AFTER DELETE ON queries BEGIN
+                    INSERT INTO queries_fts(queries_fts, rowid, query, response) VALUES ('delete', old.id, old.query, old.response);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS queries_fts_au AFTER UPDATE ON queries BEGIN
+                    INSERT INTO queries_fts(queries_fts, rowid, query, response) VALUES ('delete', old.id, old.query, old.response);
+                    INSERT INTO queries_fts(rowid, query, response) VALUES (new.id, new.query, new.response);
+                    END''')
+    if not exists:
+        # First run against an existing database: index the rows already there
+        conn.execute("INSERT INTO queries_fts(queries_fts) VALUES('rebuild')")
+
+
+def _match_expression(text):
+    # Quote every word so user input can't inject FTS5 query syntax;
+    # the last word also matches as a prefix ("irrig" finds "irrigation").
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        return None
+    terms = ['"%s"' % w for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_queries(text, page=1, limit=PAGE_SIZE, owner=None):
+    """Return (rows, has_more) for one page of queries ranked by bm25 relevance.
+
+    With owner set, only that user's queries are searched.
+    """
+    match = _match_expression(text)
+    if match is None:
+        return [], False
+    params = [match]
+    owned = ''
+    if owner is not None:
+        owned = ' AND q.user_id = ?'
+        params.append(owner)
+    rows = query('''SELECT q.* FROM queries_fts
+                    JOIN queries q ON q.id = queries_fts.rowid
+                    WHERE queries_fts MATCH ?%s
+                    ORDER BY queries_fts.rank
+                    LIMIT ? OFFSET ?''' % owned, params + [limit + 1, (page - 1) * limit])
+    return rows[:limit], len(rows) > limit
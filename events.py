@@ -0,0 +1,66 @@
+# In-process pub/sub for live dashboard updates
+#
+# The write routes publish an event once their write has committed, and each
+# open /events stream holds a subscription. Experts receive every event;
+# farmers only receive events about their own queries. Subscriber queues are
+# bounded, so a stalled client loses events instead of growing memory; it
+# is expected to re-fetch /dashboard after it reconnects.
+import json
+import queue
+import threading
+
+
+class Subscription:
+    def __init__(self, user_id, role, max_queue):
+        self.user_id = user_id
+        self.role = role
+        self.queue = queue.Queue(maxsize=max_queue)
+
+    def wants(self, event):
+        return self.role != 'farmer' or event.get('user_id') == self.user_id
+
+
+class Broker:
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, role):
+        sub = Subscription(user_id, role, self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.wants(event):
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    pass
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+def stream(broker, sub, heartbeat=15.0):
+    """Yield server-sent events for one subscription until the client goes away."""
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = sub.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+            yield 'event: %s\ndata: %s\n\n' % (event['type'], json.dumps(event))
+    finally:
+        broker.unsubscribe(sub)
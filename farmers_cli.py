@@ -0,0 +1,213 @@
+# Bulk import/export for farmers.db
+#
+# USAGE:
+#     python farmers_cli.py import users users.csv
+#     python farmers_cli.py import queries queries.jsonl --batch 100000
+#     python farmers_cli.py export queries queries.csv      (or "-" for stdout)
+#     python farmers_cli.py bench --rows 10000000
+#
+# Files are streamed: CSV needs a header row, JSONL one object per line, and
+# the format is taken from the extension unless --format is given. Imports
+# run in large executemany() transactions with the table's secondary indexes
+# and triggers dropped, then rebuild them (and the search index) once at the
+# end. Imported plaintext passwords are hashed on each user's first login.
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import db
+
+TABLES = {
+    'users': ('id', 'username', 'password', 'role'),
+    'queries': ('id', 'user_id', 'query', 'response'),
+}
+DEFAULTS = {'queries': {'response': ''}}
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def read_rows(path, fmt):
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Progress:
+    def __init__(self, label, every=1.0):
+        self.label = label
+        self.every = every
+        self.rows = 0
+        self.start = self.last = time.perf_counter()
+
+    def add(self, n):
+        self.rows += n
+        now = time.perf_counter()
+        if now - self.last >= self.every:
+            self.last = now
+            self._print(now, end='\r')
+
+    def done(self):
+        self._print(time.perf_counter(), end='\n')
+        return self.rows / max(time.perf_counter() - self.start, 1e-9)
+
+    def _print(self, now, end):
+        elapsed = max(now - self.start, 1e-9)
+        print(f"{self.label}: {self.rows:,} rows  {self.rows / elapsed:,.0f} rows/s  {elapsed:.1f}s",
+              end=end, file=sys.stderr, flush=True)
+
+
+def _drop_deferred(conn, table):
+    # Secondary indexes and triggers are rebuilt once by db.init_db() afterwards
+    objects = conn.execute("SELECT type, name FROM sqlite_master WHERE tbl_name=? "
+                           "AND type IN ('index', 'trigger') AND sql IS NOT NULL", (table,)).fetchall()
+    for kind, name in objects:
+        conn.execute(f'DROP {kind.upper()} "{name}"')
+
+
+def import_rows(table, rows, batch_size=50000):
+    columns = TABLES[table]
+    defaults = DEFAULTS.get(table, {})
+    conn = db.get_conn()
+    conn.execute("PRAGMA synchronous=OFF")
+    progress = Progress(f"import {table}")
+    try:
+        with conn:
+            _drop_deferred(conn, table)
+        sql = None
+        for batch in batched(rows, batch_size):
+            if sql is None:
+                # Column list comes from the first record (e.g. with or without id)
+                used = [c for c in columns if c in batch[0] or c in defaults]
+                sql = "INSERT INTO %s (%s) VALUES (%s)" % (table, ', '.join(used), ', '.join('?' * len(used)))
+            values = [tuple(row.get(c) if row.get(c) is not None else defaults.get(c) for c in used)
+                      for row in batch]
+            with conn:
+                conn.executemany(sql, values)
+            progress.add(len(batch))
+    finally:
+        build_start = time.perf_counter()
+        db.init_db()
+        with conn:
+            if table == 'queries':
+                conn.execute("INSERT INTO queries_fts(queries_fts) VALUES('rebuild')")
+                conn.execute("UPDATE queries_version SET version = version + 1 WHERE id = 0")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        rate = progress.done()
+        print(f"rebuilt indexes in {time.perf_counter() - build_start:.1f}s", file=sys.stderr)
+    return progress.rows, rate
+
+
+def export_rows(table, out, fmt, batch_size=50000):
+    columns = TABLES[table]
+    cur = db.get_conn().execute("SELECT %s FROM %s ORDER BY id" % (', '.join(columns), table))
+    progress = Progress(f"export {table}")
+    writer = csv.writer(out) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        if writer:
+            writer.writerows(batch)
+        else:
+            out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in batch)
+        progress.add(len(batch))
+    return progress.rows, progress.done()
+
+
+def cmd_import(args):
+    fmt = detect_format(args.file, args.format)
+    import_rows(args.table, read_rows(args.file, fmt), args.batch)
+
+
+def cmd_export(args):
+    fmt = detect_format(args.file, args.format)
+    if args.file == '-':
+        export_rows(args.table, sys.stdout, fmt, args.batch)
+    else:
+        with open(args.file, 'w', newline='', encoding='utf-8') as out:
+            export_rows(args.table, out, fmt, args.batch)
+
+
+def cmd_bench(args):
+    # Synthetic import/export round trip against a throwaway database
+    tmp = tempfile.mkdtemp(prefix='farmers_cli_bench_')
+    try:
+        db.configure(os.path.join(tmp, 'bench.db'))
+        db.init_db()
+        users = max(args.rows // 20, 1)
+        import_rows('users', ({'username': f'user{i}', 'password': 'pw', 'role': 'farmer'}
+                              for i in range(users)), args.batch)
+        rows, rate = import_rows('queries', ({'user_id': random.randint(1, users),
+                                              'query': f'question {i} about paddy irrigation',
+                                              'response': '' if i % 3 else 'use drip irrigation'}
+                                             for i in range(args.rows)), args.batch)
+        print(f"import: {rows:,} query rows at {rate:,.0f} rows/s")
+        with open(os.path.join(tmp, 'queries.csv'), 'w', newline='', encoding='utf-8') as out:
+            rows, rate = export_rows('queries', out, 'csv', args.batch)
+        print(f"export: {rows:,} query rows at {rate:,.0f} rows/s")
+    finally:
+        db.close_all()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import/export for farmers.db')
+    parser.add_argument('--db', help='database file (default: farmers.db or $FARMERS_DB)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('import', help='stream CSV/JSONL rows into a table')
+    p.add_argument('table', choices=TABLES)
+    p.add_argument('file')
+    p.add_argument('--format', choices=('csv', 'jsonl'))
+    p.add_argument('--batch', type=int, default=50000)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('export', help='stream a table out as CSV/JSONL')
+    p.add_argument('table', choices=TABLES)
+    p.add_argument('file', nargs='?', default='-')
+    p.add_argument('--format', choices=('csv', 'jsonl'))
+    p.add_argument('--batch', type=int, default=50000)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('bench', help='measure import/export throughput on synthetic rows')
+    p.add_argument('--rows', type=int, default=10000000)
+    p.add_argument('--batch', type=int, default=50000)
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    if args.db:
+        db.configure(args.db)
+    if args.command != 'bench':
+        db.init_db()
+    args.func(args)
+    db.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,175 @@
 # Import necessary libraries
-import cv2
-import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
+import io
+import os
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Request, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.utils import secure_filename
+from batching import MicroBatcher
+from inference_pool import InferenceClient
+from interpretation import interpret_predictions, signature
+from model_loader import ModelLoader, ModelNotReady
+from preprocessing import INPUT_SIZE, Preprocessor, thread_preprocessor
+from prediction_cache import PredictionCache, content_key, perceptual_key
+import uploads
+
+# Upload limits: bodies over CROP_MAX_UPLOAD_MB are refused from the
+# Content-Length header or as soon as the stream passes the limit, and
+# images whose header claims more than CROP_MAX_PIXELS are never decoded.
+# Large images are decoded at reduced scale unless CROP_DOWNSCALE=0.
+MAX_UPLOAD_BYTES = int(float(os.environ.get('CROP_MAX_UPLOAD_MB', '10')) * 2 ** 20)
+MAX_PIXELS = int(os.environ.get('CROP_MAX_PIXELS', '50000000'))
+DOWNSCALE = os.environ.get('CROP_DOWNSCALE', '1') == '1'
+
+# Keep uploaded files in memory instead of spooling them to a temp file,
+# so /analyze can decode straight from the request buffer. Each part is
+# checked for an image Content-Type and signature while it streams in.
+class InMemoryRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        uploads.check_content_type(content_type)
+        return uploads.UploadStream(MAX_UPLOAD_BYTES)
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(UnsupportedMediaType)
+def upload_rejected(e):
+    return jsonify({"error": e.description}), e.code
+
+# Optional archival of uploads, written off the request thread
+ARCHIVE_DIR = os.environ.get('CROP_ARCHIVE_DIR')
+archiver = ThreadPoolExecutor(max_workers=1) if ARCHIVE_DIR else None
 
-# Load your trained model
-model = tf.keras.models.load_model('path_to_your_model.h5')
+# Load your trained model: the Keras .h5, or an optimized .tflite export
+# from model_export.py (CROP_BACKEND=keras|tflite overrides the extension).
+# CROP_LOAD picks when: 'background' (default) lets the app serve health
+# checks immediately while the model loads and warms up, 'lazy' waits for
+# the first request, 'eager' blocks here as before.
+MODEL_PATH = os.environ.get('CROP_MODEL', 'path_to_your_model.h5')
+LOAD_MODE = os.environ.get('CROP_LOAD', 'background')
+READY_TIMEOUT = float(os.environ.get('CROP_READY_TIMEOUT', '30'))
+# With CROP_INFERENCE_ADDRESS set, this process never loads the model: a
+# shared pool of inference workers (inference_pool.py) runs it instead
+INFERENCE_ADDRESS = os.environ.get('CROP_INFERENCE_ADDRESS')
+if INFERENCE_ADDRESS:
+    model = InferenceClient(INFERENCE_ADDRESS)
+else:
+    model = ModelLoader(MODEL_PATH, os.environ.get('CROP_BACKEND'))
+    if LOAD_MODE == 'eager':
+        model.load()
+    elif LOAD_MODE == 'background':
+        model.start()
+
+# Concurrent /analyze requests share one batched predict call: up to
+# CROP_BATCH_SIZE images, or whatever arrived within CROP_BATCH_WAIT_MS
+batcher = MicroBatcher(model.predict_on_batch,
+                       max_batch_size=int(os.environ.get('CROP_BATCH_SIZE', '32')),
+                       max_wait_ms=float(os.environ.get('CROP_BATCH_WAIT_MS', '10')))
+
+# Duplicate uploads are answered from a prediction cache keyed by content
+# hash (CROP_CACHE_SIZE entries, 0 disables), optionally matching
+# near-duplicates by perceptual hash and persisted to CROP_CACHE_PATH
+CACHE_SIZE = int(os.environ.get('CROP_CACHE_SIZE', '10000'))
+USE_PHASH = os.environ.get('CROP_CACHE_PHASH') == '1'
+prediction_cache = None
+if CACHE_SIZE:
+    prediction_cache = PredictionCache(
+        max_entries=CACHE_SIZE,
+        path=os.environ.get('CROP_CACHE_PATH'),
+        namespace='%s@%s:%s' % (MODEL_PATH, os.path.getmtime(MODEL_PATH) if os.path.exists(MODEL_PATH) else 0,
+                                signature()),
+        phash_distance=int(os.environ.get('CROP_CACHE_PHASH_DISTANCE', '0')))
 
 # Function to process images
 def process_image(image_path):
-    image = cv2.imread(image_path)
-    # Preprocess the image (resize, normalize, etc.)
-    image = cv2.resize(image, (224, 224))  # Example size
-    image = image / 255.0  # Normalize
-    return np.expand_dims(image, axis=0)
+    # Resize, channel swap and normalize (float32), shaped (1, 224, 224, 3)
+    with open(image_path, 'rb') as f:
+        return Preprocessor(max_batch=1).new_batch([decode_image(f.read())])
+
+def preprocess(image):
+    # Same, into this thread's reusable buffer: valid until its next call,
+    # which is fine because the request thread waits for its prediction
+    return thread_preprocessor().batch([image])
+
+def upload_buffer(file):
+    # Zero-copy view of an in-memory upload; read() for any other stream
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+    return file.read()
+
+def decode_image(data):
+    # Decode JPEG/PNG bytes without touching the disk, no larger than the
+    # model needs; None if undecodable
+    return uploads.decode_image(data, INPUT_SIZE if DOWNSCALE else None, MAX_PIXELS)
+
+@contextmanager
+def upload_bytes(file):
+    data = upload_buffer(file)
+    try:
+        yield data
+    finally:
+        # The request stream can't be closed while a view of it is alive
+        if isinstance(data, memoryview):
+            data.release()
+
+def archive_upload(data, filename):
+    path = os.path.join(ARCHIVE_DIR, secure_filename(filename) or 'upload')
+    with open(path, 'wb') as f:
+        f.write(data)
 
 # Endpoint to analyze crop health
 @app.route('/analyze', methods=['POST'])
 def analyze():
     file = request.files['image']
-    image_path = 'path_to_save_image/' + file.filename
-    file.save(image_path)
+    key = phash = None
+    with upload_bytes(file) as data:
+        if prediction_cache is not None:
+            key = content_key(data)
+            cached = prediction_cache.get(key)
+            if cached is not None:
+                return jsonify(cached)
+        image = decode_image(data)
+        if image is None:
+            return jsonify({"error": "Could not decode image"}), 400
+        if archiver:
+            archiver.submit(archive_upload, bytes(data), file.filename)
 
-    processed_image = process_image(image_path)
-    predictions = model.predict(processed_image)
+    if prediction_cache is not None and USE_PHASH:
+        phash = perceptual_key(image)
+        cached = prediction_cache.get_similar(phash)
+        if cached is not None:
+            prediction_cache.put(key, cached, phash)
+            return jsonify(cached)
+
+    try:
+        model.get(timeout=READY_TIMEOUT)
+    except ModelNotReady as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': '5'}
+
+    processed_image = preprocess(image)
+    predictions = batcher.predict(processed_image)
     
-    # Interpret predictions (this will depend on your model)
+    # Top-k labelled classes (see interpretation.py for the label map)
     result = interpret_predictions(predictions)
+    if prediction_cache is not None:
+        prediction_cache.put(key, result, phash)
     
     return jsonify(result)
 
-def interpret_predictions(predictions):
-    # Logic to interpret model predictions
-    return {"health_status": "Healthy" if predictions[0] > 0.5 else "Unhealthy"}
+# Liveness: the process is up and serving
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok"})
+
+# Readiness: the model is loaded and warmed up
+@app.route('/ready')
+def ready():
+    status = model.status()
+    return jsonify(status), 200 if status['state'] == 'ready' else 503
 
 if __name__ == '__main__':
     app.run(debug=True)
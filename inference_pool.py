@@ -0,0 +1,275 @@
+# Multi-process inference pool for the crop-health service
+#
+# USAGE:
+#     python inference_pool.py --model path_to_your_model.h5 --workers 4 \
+#                              --address /tmp/crop-inference.sock
+#     CROP_INFERENCE_ADDRESS=/tmp/crop-inference.sock gunicorn -w 8 farming_cv2:app
+#
+# A fixed pool of worker processes owns the model. Web front-end processes
+# never load it; they send batches here instead. Model memory therefore
+# scales with --workers, not with the number of web workers, and all cores
+# can be used without a model copy per web worker.
+#
+# Front ends connect over a local multiprocessing connection (Unix socket).
+# Each input batch is placed in a shared-memory block and only its name and
+# shape travel over the socket. Workers read the batch straight from shared
+# memory and send back the (small) predictions.
+import argparse
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = '/tmp/crop-inference.sock'
+AUTHKEY = os.environ.get('CROP_INFERENCE_AUTHKEY', 'crop-inference').encode()
+
+
+# Worker processes
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    # The front end owns the block; stop this process's resource tracker
+    # from unlinking it when the worker exits
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker(model_path, backend, tasks, results, ready, max_batch):
+    from model_loader import ModelLoader
+    model = ModelLoader(model_path, backend)
+    try:
+        model.load()
+    except Exception as e:
+        log.error("inference worker %d could not load the model: %s", os.getpid(), e)
+        return
+    with ready.get_lock():
+        ready.value += 1
+    while True:
+        # Take one task, plus whatever else is already waiting, up to max_batch images
+        batch = [tasks.get()]
+        size = batch[0][3][0]
+        while size < max_batch:
+            try:
+                task = tasks.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(task)
+            size += task[3][0]
+        arrays, blocks = [], []
+        try:
+            for _, _, name, shape, dtype in batch:
+                shm, array = _attach(name, shape, dtype)
+                blocks.append(shm)
+                arrays.append(array)
+            outputs = np.asarray(model.predict_on_batch(np.concatenate(arrays) if len(arrays) > 1 else arrays[0]))
+        except Exception as e:
+            for conn_id, req_id, *_ in batch:
+                results.put((conn_id, req_id, None, '%s: %s' % (type(e).__name__, e)))
+            continue
+        finally:
+            del arrays
+            for shm in blocks:
+                shm.close()
+        offset = 0
+        for conn_id, req_id, _, shape, _ in batch:
+            results.put((conn_id, req_id, outputs[offset:offset + shape[0]], None))
+            offset += shape[0]
+
+
+# Server (runs in the pool's parent process)
+
+class InferenceServer:
+    def __init__(self, model_path, address=DEFAULT_ADDRESS, workers=2, backend=None, max_batch=64):
+        ctx = mp.get_context('spawn')  # TensorFlow does not survive fork
+        self.address = address
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.ready = ctx.Value('i', 0)
+        self.workers = [ctx.Process(target=_worker, name='inference-%d' % i, daemon=True,
+                                    args=(model_path, backend, self.tasks, self.results, self.ready, max_batch))
+                        for i in range(workers)]
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def serve_forever(self):
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self._dispatch_results, daemon=True).start()
+        if self.address.startswith('/') and os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, authkey=AUTHKEY) as listener:
+            log.info("inference pool listening on %s with %d workers", self.address, len(self.workers))
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    log.warning("rejected inference client: %s", e)
+                    continue
+                conn_id = next(self._ids)
+                with self._lock:
+                    self._connections[conn_id] = (conn, threading.Lock())
+                threading.Thread(target=self._serve_client, args=(conn_id, conn), daemon=True).start()
+
+    def _send(self, conn_id, message):
+        with self._lock:
+            entry = self._connections.get(conn_id)
+        if entry is None:
+            return
+        conn, send_lock = entry
+        try:
+            with send_lock:
+                conn.send(message)
+        except OSError:
+            pass
+
+    def _serve_client(self, conn_id, conn):
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == 'predict':
+                    _, req_id, name, shape, dtype = message
+                    self.tasks.put((conn_id, req_id, name, shape, dtype))
+                elif message[0] == 'status':
+                    alive = sum(w.is_alive() for w in self.workers)
+                    if not alive:
+                        state = 'failed'  # every worker failed to load, or has died since
+                    else:
+                        state = 'ready' if self.ready.value else 'loading'
+                    self._send(conn_id, ('status', message[1], {
+                        'state': state,
+                        'workers': len(self.workers), 'workers_alive': alive,
+                        'workers_ready': self.ready.value}))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.pop(conn_id, None)
+            conn.close()
+
+    def _dispatch_results(self):
+        while True:
+            conn_id, req_id, outputs, error = self.results.get()
+            if error is None:
+                self._send(conn_id, ('result', req_id, outputs))
+            else:
+                self._send(conn_id, ('error', req_id, error))
+
+
+# Front-end client
+
+class InferenceClient:
+    """Stands in for the model in a web worker: predict_on_batch() runs in the pool."""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self._conn = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = False  # pool reported ready; cleared if the connection drops
+
+    def _connection(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=AUTHKEY)
+                threading.Thread(target=self._read_replies, args=(self._conn,), daemon=True).start()
+            return self._conn
+
+    def _read_replies(self, conn):
+        try:
+            while True:
+                kind, req_id, payload = conn.recv()
+                with self._lock:
+                    future = self._pending.pop(req_id, None)
+                if future is None:
+                    continue
+                if kind == 'error':
+                    future.set_exception(RuntimeError(payload))
+                else:
+                    future.set_result(payload)
+        except (EOFError, OSError) as e:
+            with self._lock:
+                self._conn = None
+                self._ready = False
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError("inference pool went away: %s" % e))
+
+    def _request(self, *message):
+        conn = self._connection()
+        req_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            if self._conn is not conn:
+                raise ConnectionError("inference pool went away")
+            self._pending[req_id] = future
+        try:
+            with self._send_lock:
+                conn.send((message[0], req_id) + message[1:])
+        except BaseException:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise
+        return future
+
+    def predict_on_batch(self, batch, timeout=60):
+        batch = np.ascontiguousarray(batch)
+        shm = shared_memory.SharedMemory(create=True, size=batch.nbytes)
+        try:
+            np.ndarray(batch.shape, dtype=batch.dtype, buffer=shm.buf)[...] = batch
+            future = self._request('predict', shm.name, batch.shape, batch.dtype.str)
+            return future.result(timeout)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # ModelLoader-compatible surface used by farming_cv2's /analyze and /ready
+
+    def get(self, timeout=None):
+        from model_loader import ModelNotReady
+        if self._ready:
+            return self  # no status round trip per request once the pool is up
+        status = self.status(timeout or 5)
+        if status['state'] == 'unavailable':
+            raise ModelNotReady("inference pool unavailable: %s" % status['error'])
+        if status['state'] == 'failed':
+            raise ModelNotReady("inference pool has no live workers (%d failed to load or died)"
+                                % status['workers'])
+        if status['state'] != 'ready':
+            raise ModelNotReady("inference pool is still loading")
+        return self
+
+    def status(self, timeout=5):
+        try:
+            status = self._request('status').result(timeout)
+        except Exception as e:
+            self._ready = False
+            return {'state': 'unavailable', 'address': self.address, 'error': str(e)}
+        self._ready = status['state'] == 'ready'
+        return dict(status, address=self.address)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the crop-health inference worker pool')
+    parser.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    parser.add_argument('--backend', choices=('keras', 'tflite'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('CROP_INFERENCE_WORKERS', '2')))
+    parser.add_argument('--address', default=os.environ.get('CROP_INFERENCE_ADDRESS', DEFAULT_ADDRESS))
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+    InferenceServer(args.model, args.address, args.workers, args.backend, args.max_batch).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
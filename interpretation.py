@@ -0,0 +1,100 @@
+# Turning crop-health model outputs into labelled results
+#
+# interpret_batch() works on a whole (n, classes) output array at once:
+# outputs are converted to probabilities, optionally temperature-scaled,
+# and the top-k classes per image are picked with one argpartition, so
+# batch scoring doesn't loop over images in Python.
+#
+# CROP_LABELS names the classes: a JSON file (list, or {"index": "name"}),
+# or a comma-separated list. A single-output model is treated as a sigmoid
+# P(healthy) with the labels Unhealthy, Healthy unless configured otherwise.
+# CROP_OUTPUT says what the model emits: 'auto' (default), 'sigmoid',
+# 'softmax' (probabilities) or 'logits'. CROP_TEMPERATURE > 1 softens
+# overconfident scores (fit it on a held-out set); CROP_TOP_K sets k.
+import json
+import os
+
+import numpy as np
+
+BINARY_LABELS = ('Unhealthy', 'Healthy')
+
+
+def load_labels(spec):
+    if not spec:
+        return None
+    if os.path.exists(spec):
+        with open(spec, encoding='utf-8') as f:
+            labels = json.load(f)
+        if isinstance(labels, dict):
+            return [labels[k] for k in sorted(labels, key=int)]
+        return list(labels)
+    return [label.strip() for label in spec.split(',')]
+
+
+LABELS = load_labels(os.environ.get('CROP_LABELS'))
+OUTPUT = os.environ.get('CROP_OUTPUT', 'auto')
+TEMPERATURE = float(os.environ.get('CROP_TEMPERATURE', '1'))
+TOP_K = int(os.environ.get('CROP_TOP_K', '3'))
+
+
+def signature():
+    """Identifies the settings that shape results, for cache namespacing."""
+    return json.dumps([LABELS, OUTPUT, TEMPERATURE, TOP_K])
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+def probabilities(outputs, kind=OUTPUT, temperature=TEMPERATURE):
+    """(n, classes) float32 probabilities for raw model outputs."""
+    outputs = np.asarray(outputs, dtype=np.float32).reshape(len(outputs), -1)
+    if kind == 'auto':
+        if outputs.shape[1] == 1:
+            kind = 'sigmoid'
+        elif outputs.min() >= 0 and np.allclose(outputs.sum(axis=1), 1, atol=1e-3):
+            kind = 'softmax'
+        else:
+            kind = 'logits'
+    if kind == 'sigmoid':
+        # One P(positive) column -> two columns [P(negative), P(positive)]
+        p = np.clip(outputs, 1e-7, 1 - 1e-7)
+        if temperature != 1:
+            p = 1 / (1 + np.exp(-np.log(p / (1 - p)) / temperature))
+        return np.hstack([1 - p, p])
+    if kind == 'softmax':
+        if temperature == 1:
+            return outputs
+        return _softmax(np.log(np.clip(outputs, 1e-7, None)) / temperature)
+    if kind == 'logits':
+        return _softmax(outputs / temperature)
+    raise ValueError("unknown model output kind %r" % kind)
+
+
+def interpret_batch(outputs, top_k=TOP_K, labels=LABELS):
+    """One result dict per image, each with the top_k classes by score."""
+    probs = probabilities(outputs)
+    n, classes = probs.shape
+    if labels is None:
+        labels = BINARY_LABELS if classes == 2 else ['class_%d' % i for i in range(classes)]
+    if len(labels) != classes:
+        raise ValueError("model has %d classes but %d labels are configured" % (classes, len(labels)))
+    k = max(1, min(top_k, classes))
+    top = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(probs, top, axis=1)
+    order = np.argsort(-scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1).astype(np.float64).round(4).tolist()
+    return [{
+        "health_status": labels[row[0]],
+        "confidence": row_scores[0],
+        "top_k": [{"label": labels[c], "score": s} for c, s in zip(row, row_scores)],
+    } for row, row_scores in zip(top.tolist(), scores)]
+
+
+def interpret_predictions(predictions):
+    """Result for a single-image prediction batch."""
+    return interpret_batch(predictions[:1])[0]
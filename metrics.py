@@ -0,0 +1,162 @@
+# Opt-in request and SQL instrumentation for the farmers Q&A app
+#
+# install(app) records, for every request: wall time per route, time spent
+# in SQL statements (with row counts), time waiting for SQLite's writer
+# lock, new-connection setup and template rendering. Totals are served on
+# /metrics in Prometheus text format, and requests slower than slow_ms are
+# logged together with the statements they ran.
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+
+import db
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (n, _escape(v)) for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = defaultdict(lambda: [[0] * len(BUCKETS), 0.0, 0])  # buckets, sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series[label_values]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        with self._lock:
+            for label_values, (buckets, total, count) in sorted(self._series.items()):
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append('%s_bucket%s %d' % (self.name, _labels(self.labels + ('le',), label_values + (bound,)), n))
+                lines.append('%s_bucket%s %d' % (self.name, _labels(self.labels + ('le',), label_values + ('+Inf',)), count))
+                lines.append('%s_sum%s %.6f' % (self.name, _labels(self.labels, label_values), total))
+                lines.append('%s_count%s %d' % (self.name, _labels(self.labels, label_values), count))
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append('%s%s %g' % (self.name, _labels(self.labels, label_values), value))
+        return lines
+
+
+def statement_label(sql):
+    """Collapse whitespace and truncate so each distinct statement is one series."""
+    if sql is None:
+        return ''
+    return re.sub(r'\s+', ' ', sql).strip()[:80]
+
+
+class Metrics:
+    def __init__(self, slow_ms=500):
+        self.slow_ms = slow_ms
+        self.request_seconds = Histogram('farmers_request_seconds', 'Request wall time', ('route', 'method', 'status'))
+        self.sql_seconds = Histogram('farmers_sql_seconds', 'SQL statement time', ('kind', 'statement'))
+        self.sql_rows = Counter('farmers_sql_rows_total', 'Rows returned or changed by SQL statements', ('kind', 'statement'))
+        self.lock_wait_seconds = Histogram('farmers_sql_lock_wait_seconds', 'Time waiting for the SQLite writer lock')
+        self.connect_seconds = Histogram('farmers_sql_connect_seconds', 'New SQLite connection setup time')
+        self.render_seconds = Histogram('farmers_template_render_seconds', 'Template rendering time', ('template',))
+        self.slow_requests = Counter('farmers_slow_requests_total', 'Requests slower than the slow threshold', ('route',))
+
+    def record_sql(self, kind, sql, seconds, rows):
+        if kind == 'lock_wait':
+            self.lock_wait_seconds.observe(seconds)
+        elif kind == 'connect':
+            self.connect_seconds.observe(seconds)
+        else:
+            label = statement_label(sql)
+            self.sql_seconds.observe(seconds, kind, label)
+            self.sql_rows.inc(rows, kind, label)
+        if has_request_context() and hasattr(g, 'metrics_sql'):
+            g.metrics_sql.append((kind, sql, seconds, rows))
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.sql_seconds, self.sql_rows, self.lock_wait_seconds,
+                       self.connect_seconds, self.render_seconds, self.slow_requests):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def install(app, slow_ms=500):
+    """Instrument a Flask app and add the /metrics endpoint; returns the Metrics."""
+    metrics = Metrics(slow_ms)
+    db.tracer = metrics.record_sql
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = []
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+        if elapsed * 1000 >= metrics.slow_ms:
+            metrics.slow_requests.inc(1, route)
+            statements = g.get('metrics_sql', [])
+            log.warning("slow request %s %s: %.1f ms, %d SQL statements%s", request.method, request.path,
+                        elapsed * 1000, len(statements),
+                        ''.join('\n  %-9s %8.2f ms %6d rows  %s' % (kind, seconds * 1000, rows, statement_label(sql))
+                                for kind, sql, seconds, rows in statements))
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        g.metrics_render_start = time.perf_counter()
+
+    def _render_finished(sender, template, context, **extra):
+        start = g.pop('metrics_render_start', None)
+        if start is not None:
+            metrics.render_seconds.observe(time.perf_counter() - start, template.name)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
@@ -0,0 +1,153 @@
+# Export, validate and benchmark optimized crop-health models
+#
+# USAGE:
+#     python model_export.py export  --model path_to_your_model.h5 --quant float16 -o model_fp16.tflite
+#     python model_export.py export  --model path_to_your_model.h5 --quant int8 --calib-dir photos/ -o model_int8.tflite
+#     python model_export.py compare --model path_to_your_model.h5 --candidate model_int8.tflite --images photos/
+#     python model_export.py bench   path_to_your_model.h5 model_fp16.tflite model_int8.tflite
+#
+# export writes a TFLite artifact with one of these quantizations:
+#   dynamic  int8 weights, float activations (no calibration data needed)
+#   float16  float16 weights
+#   int8     full integer model, calibrated on --calib-dir images
+# compare runs the original and the exported model on the same images and
+# reports output drift and how often the health verdict changes.
+# bench loads each model in a fresh process and reports per-image latency
+# and resident memory.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from backends import load_model
+from interpretation import interpret_predictions
+from preprocessing import Preprocessor
+from score_images import find_images
+
+
+def load_images(directory, limit):
+    preprocessor = Preprocessor(max_batch=1)
+    for path in find_images([directory]):
+        image = cv2.imread(path)
+        if image is not None:
+            yield preprocessor.new_batch([image])
+            limit -= 1
+            if limit <= 0:
+                return
+
+
+def cmd_export(args):
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if args.quant == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif args.quant == 'int8':
+        if not args.calib_dir:
+            sys.exit("int8 export needs --calib-dir with representative images")
+
+        def representative_dataset():
+            for batch in load_images(args.calib_dir, args.calib_samples):
+                yield [batch]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    artifact = converter.convert()
+    with open(args.output, 'wb') as f:
+        f.write(artifact)
+    print(f"wrote {args.output}: {len(artifact) / 2 ** 20:.1f} MB "
+          f"(original {os.path.getsize(args.model) / 2 ** 20:.1f} MB)")
+
+
+def cmd_compare(args):
+    reference = load_model(args.model)
+    candidate = load_model(args.candidate)
+    diffs, flips, n = [], 0, 0
+    for batch in load_images(args.images, args.limit):
+        expected = reference.predict_on_batch(batch)
+        actual = candidate.predict_on_batch(batch)
+        diffs.append(np.abs(expected - actual).max())
+        if interpret_predictions(expected)['health_status'] != interpret_predictions(actual)['health_status']:
+            flips += 1
+        n += 1
+    if not n:
+        sys.exit("no readable images in %s" % args.images)
+    diffs = np.array(diffs)
+    print(f"{n} images: max |delta| mean {diffs.mean():.5f}, p99 {np.percentile(diffs, 99):.5f}, "
+          f"max {diffs.max():.5f}")
+    print(f"verdict changed on {flips} images ({flips / n:.2%})")
+
+
+def cmd_bench_one(args):
+    # Runs in its own process so each backend's memory is measured alone
+    model = load_model(args.path)
+    batch = np.random.rand(1, 224, 224, 3).astype(np.float32)
+    model.predict_on_batch(batch)  # warm up
+    samples = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        model.predict_on_batch(batch)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(json.dumps({
+        'backend': model.name,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p95_ms': samples[int(len(samples) * 0.95)] * 1000,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB on Linux
+    }))
+
+
+def cmd_bench(args):
+    print(f"{'model':<32} {'backend':<7} {'size MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak RSS MB':>12}")
+    for path in args.paths:
+        out = subprocess.run([sys.executable, __file__, '_bench-one', path, '--iterations', str(args.iterations)],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{os.path.basename(path):<32} {r['backend']:<7} {os.path.getsize(path) / 2 ** 20:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['rss_mb']:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export and evaluate optimized crop-health models')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('export', help='convert the .h5 model to a quantized .tflite')
+    p.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    p.add_argument('--quant', choices=('dynamic', 'float16', 'int8'), default='float16')
+    p.add_argument('--calib-dir', help='representative images for int8 calibration')
+    p.add_argument('--calib-samples', type=int, default=200)
+    p.add_argument('-o', '--output', required=True)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('compare', help='accuracy delta of an exported model vs. the original')
+    p.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    p.add_argument('--candidate', required=True)
+    p.add_argument('--images', required=True)
+    p.add_argument('--limit', type=int, default=1000)
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser('bench', help='per-image latency and memory for each model file')
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--iterations', type=int, default=200)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser('_bench-one')
+    p.add_argument('path')
+    p.add_argument('--iterations', type=int, default=200)
+    p.set_defaults(func=cmd_bench_one)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Background / on-demand model loading for the crop-health service
+#
+# Importing TensorFlow and loading the model takes seconds, so the service
+# no longer does it at import time. ModelLoader loads the model on a
+# background thread (or on first use), runs one warmup inference so the
+# first real request doesn't pay for graph tracing, and reports its state
+# and timings for the readiness endpoint.
+import logging
+import threading
+import time
+
+import numpy as np
+
+from backends import load_model
+from preprocessing import INPUT_SIZE
+
+log = logging.getLogger(__name__)
+
+PROCESS_START = time.monotonic()
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+class ModelLoader:
+    def __init__(self, path, backend=None):
+        self.path = path
+        self.backend = backend
+        self.state = 'not_loaded'  # -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.ready_after = None  # seconds from process start until ready
+        self._model = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin loading on a background thread (no-op if already started)."""
+        with self._lock:
+            if self.state != 'not_loaded':
+                return
+            self.state = 'loading'
+        threading.Thread(target=self._load, name='model-loader', daemon=True).start()
+
+    def load(self):
+        """Load on the calling thread (no-op if already started) and wait for it."""
+        with self._lock:
+            started = self.state != 'not_loaded'
+            if not started:
+                self.state = 'loading'
+        if not started:
+            self._load()
+        return self.get()
+
+    def get(self, timeout=None):
+        """Return the warmed-up model, starting the load if nobody has yet."""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise ModelNotReady("model is still loading")
+        if self.state == 'failed':
+            raise ModelNotReady("model failed to load: %s" % self.error)
+        return self._model
+
+    def predict_on_batch(self, batch):
+        return self.get().predict_on_batch(batch)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'model': self.path,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'ready_after_seconds': self.ready_after,
+        }
+
+    def _load(self):
+        try:
+            start = time.monotonic()
+            model = load_model(self.path, self.backend)
+            loaded = time.monotonic()
+            width, height = INPUT_SIZE
+            model.predict_on_batch(np.zeros((1, height, width, 3), np.float32))
+            warmed = time.monotonic()
+            self.load_seconds = loaded - start
+            self.warmup_seconds = warmed - loaded
+            self.ready_after = warmed - PROCESS_START
+            self._model = model
+            self.state = 'ready'
+            log.info("model %s ready: load %.2fs, warmup %.2fs, %.2fs after start",
+                     self.path, self.load_seconds, self.warmup_seconds, self.ready_after)
+        except Exception as e:
+            self.error = '%s: %s' % (type(e).__name__, e)
+            self.state = 'failed'
+            log.exception("loading model %s failed", self.path)
+        finally:
+            self._ready.set()
@@ -0,0 +1,32 @@
+# Rendered-page cache for the farmers Q&A app
+#
+# Entries are keyed by everything that shapes a page, including the current
+# db.queries_version(), so a write simply makes old keys unreachable and the
+# LRU bound lets them age out.
+import threading
+from collections import OrderedDict
+
+
+class PageCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,171 @@
+# Password hashing for the farmers Q&A app
+#
+# Passwords are stored as scrypt hashes:
+#     scrypt$<log_n>$<r>$<p>$<salt>$<hash>
+# The cost (N = 2**log_n) is tunable with FARMERS_SCRYPT_LOG_N; hashes made
+# with an older cost, and legacy plaintext rows, are upgraded on next login.
+# Hashing and verification run on a small thread pool (hashlib releases the
+# GIL while scrypt runs) so concurrent logins never pile more CPU work onto a
+# core than it can take. Callers still wait for the result, so this bounds
+# CPU use, not request latency.
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+LOG_N = int(os.environ.get('FARMERS_SCRYPT_LOG_N', '14'))  # 16 MB, ~50 ms per hash
+R = 8
+P = 1
+SALT_BYTES = 16
+PREFIX = 'scrypt'
+
+_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='scrypt')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+
+def _scrypt(password, salt, log_n, r, p):
+    n = 1 << log_n
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+
+def hash_password(password, log_n=None):
+    log_n = LOG_N if log_n is None else log_n
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, log_n, R, P)
+    return '$'.join((PREFIX, str(log_n), str(R), str(P), _b64(salt), _b64(digest)))
+
+
+# Checked against when a login names an unknown user (see check_unknown_user)
+_DUMMY_HASH = hash_password(os.urandom(SALT_BYTES).hex())
+
+
+def verify_password(password, stored):
+    """Check password against a stored hash (or a legacy plaintext value)."""
+    if not stored.startswith(PREFIX + '$'):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    try:
+        _, log_n, r, p, salt, digest = stored.split('$')
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(log_n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored):
+    """True for plaintext rows and hashes made with different cost settings."""
+    return not stored.startswith('$'.join((PREFIX, str(LOG_N), str(R), str(P))) + '$')
+
+
+# Successful verifications are remembered briefly so repeat logins (e.g. a
+# user re-authenticating on several devices) skip scrypt. Only a SHA-256 of
+# the stored hash and the password is kept, and since the stored hash embeds
+# a fresh salt, a password change invalidates old entries automatically.
+class VerifyCache:
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(password, stored):
+        return hashlib.sha256(stored.encode('utf-8') + b'\0' + password.encode('utf-8')).digest()
+
+    def get(self, password, stored):
+        key = self._key(password, stored)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, password, stored):
+        key = self._key(password, stored)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Bounded, in-memory per-username failure counter. A username with
+# max_failures failed logins inside `window` seconds is refused until the
+# window passes; the least recently seen usernames are evicted first.
+class LoginLimiter:
+    def __init__(self, max_failures=5, window=300, max_users=10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_users = max_users
+        self._failures = OrderedDict()  # username -> (count, first failure time)
+        self._lock = threading.Lock()
+
+    def is_blocked(self, username):
+        with self._lock:
+            entry = self._failures.get(username)
+            if entry is None:
+                return False
+            count, since = entry
+            if time.monotonic() - since > self.window:
+                del self._failures[username]
+                return False
+            return count >= self.max_failures
+
+    def record_failure(self, username):
+        now = time.monotonic()
+        with self._lock:
+            count, since = self._failures.pop(username, (0, now))
+            if now - since > self.window:
+                count, since = 0, now
+            self._failures[username] = (count + 1, since)
+            while len(self._failures) > self.max_users:
+                self._failures.popitem(last=False)
+
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+
+
+cache = VerifyCache()
+limiter = LoginLimiter()
+
+
+def check_password(password, stored):
+    """Verify on the scrypt pool (blocking), short-circuiting recently verified logins."""
+    if cache.get(password, stored):
+        return True
+    ok = _pool.submit(verify_password, password, stored).result()
+    if ok:
+        cache.add(password, stored)
+    return ok
+
+
+def check_unknown_user(password):
+    """Spend the same scrypt time as check_password for a username that doesn't exist.
+
+    Without this a failed login returns early for unknown usernames, and the
+    response time tells an attacker which usernames are registered.
+    """
+    _pool.submit(verify_password, password, _DUMMY_HASH).result()
+    return False
+
+
+def hash_password_pooled(password):
+    """Hash on the scrypt pool; returns the stored form.
+
+    This caps how many hashes run at once (one per core); the calling
+    request thread still blocks until its hash is done.
+    """
+    return _pool.submit(hash_password, password).result()
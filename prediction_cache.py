@@ -0,0 +1,127 @@
+# Prediction cache for repeated crop images
+#
+# Field devices often re-upload the same photo. Results are cached under a
+# BLAKE2 hash of the uploaded bytes, so an exact duplicate returns before
+# the image is even decoded. Optionally, a 64-bit difference hash (dHash) of
+# the decoded image also finds near-duplicates such as re-encoded or resized
+# copies. The cache is an LRU bounded by entry count, and can be persisted
+# to SQLite so it survives restarts.
+#
+# Entries are tagged with a namespace (e.g. the model file and its mtime),
+# and persisted entries from another namespace are dropped on load.
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def content_key(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_key(image):
+    """64-bit dHash: sign of horizontal gradients on a 9x8 grayscale thumbnail.
+
+    Returned as a signed integer so it fits an SQLite INTEGER column.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>i8')[0])
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, path=None, namespace='', phash_distance=0):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.phash_distance = phash_distance
+        self._entries = OrderedDict()  # content key -> (phash, result)
+        self._by_phash = {}            # phash -> content key
+        self._lock = threading.Lock()     # guards the in-memory entries
+        self._db_lock = threading.Lock()  # serializes writes on the shared connection
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS predictions (
+                                key TEXT PRIMARY KEY,
+                                namespace TEXT NOT NULL,
+                                phash INTEGER,
+                                result TEXT NOT NULL,
+                                last_used REAL NOT NULL)''')
+            self._load()
+
+    def _load(self):
+        rows = self._conn.execute("SELECT key, phash, result FROM predictions WHERE namespace=? "
+                                  "ORDER BY last_used DESC LIMIT ?", (self.namespace, self.max_entries))
+        for key, phash, result in reversed(rows.fetchall()):
+            self._store(key, phash, json.loads(result))
+        # Drop what didn't fit and anything scored by a different model
+        with self._conn:
+            self._conn.execute("DELETE FROM predictions WHERE namespace<>? OR key NOT IN "
+                               "(SELECT key FROM predictions WHERE namespace=? ORDER BY last_used DESC LIMIT ?)",
+                               (self.namespace, self.namespace, self.max_entries))
+
+    def _store(self, key, phash, result):
+        self._entries[key] = (phash, result)
+        self._entries.move_to_end(key)
+        if phash is not None:
+            self._by_phash[phash] = key
+        while len(self._entries) > self.max_entries:
+            old_key, (old_phash, _) = self._entries.popitem(last=False)
+            if old_phash is not None and self._by_phash.get(old_phash) == old_key:
+                del self._by_phash[old_phash]
+
+    def get(self, key):
+        """Exact-duplicate lookup by content key; None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get_similar(self, phash):
+        """Near-duplicate lookup by dHash within phash_distance bits; None on a miss."""
+        with self._lock:
+            key = self._by_phash.get(phash)
+            if key is None and self.phash_distance:
+                candidates = list(self._by_phash.items())
+        if key is None and self.phash_distance:
+            # Scanned outside the lock so exact-match lookups aren't held up
+            for other, other_key in candidates:
+                if bin((phash ^ other) & 0xFFFFFFFFFFFFFFFF).count('1') <= self.phash_distance:
+                    key = other_key
+                    break
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)  # may have been evicted meanwhile
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, result, phash=None):
+        with self._lock:
+            self._store(key, phash, result)
+        if self._conn is not None:
+            # The disk write happens after the lookup lock is released
+            row = (key, self.namespace, phash, json.dumps(result), time.time())
+            with self._db_lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO predictions (key, namespace, phash, result, last_used) "
+                                   "VALUES (?,?,?,?,?)", row)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
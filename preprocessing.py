@@ -0,0 +1,68 @@
+# Image preprocessing for the crop-health model
+#
+# Resize, BGR -> model channel order and scaling to [0, 1] are fused into one
+# pass per image that writes float32 straight into a (batch, H, W, 3) output
+# array: cv2.resize fills a reused uint8 scratch image, and one np.multiply
+# reads it through a reversed-channel view and writes the scaled result into
+# the batch slot. No float64 or full-size intermediate arrays are created.
+#
+# Used by the HTTP path (farming_cv2.py) and by offline batch scoring.
+import os
+import threading
+
+import cv2
+import numpy as np
+
+INPUT_SIZE = (224, 224)  # (width, height) the model was trained on
+# OpenCV decodes to BGR; most Keras models are trained on RGB
+CHANNEL_ORDER = os.environ.get('CROP_CHANNEL_ORDER', 'RGB').upper()
+SCALE = np.float32(1 / 255.0)
+
+
+class Preprocessor:
+    def __init__(self, size=INPUT_SIZE, max_batch=32, channel_order=CHANNEL_ORDER):
+        self.size = size
+        self.max_batch = max_batch
+        self.swap_channels = channel_order == 'RGB'
+        width, height = size
+        self._scratch = np.empty((height, width, 3), np.uint8)
+        self._batch = None  # allocated on first use of the shared buffer
+
+    def _into(self, image, out):
+        cv2.resize(image, self.size, dst=self._scratch, interpolation=cv2.INTER_LINEAR)
+        source = self._scratch[..., ::-1] if self.swap_channels else self._scratch
+        np.multiply(source, SCALE, out=out)
+
+    def batch(self, images, out=None):
+        """Preprocess a list of BGR uint8 images into a float32 (n, H, W, 3) batch.
+
+        Without `out`, the result is a view of this Preprocessor's reusable
+        buffer and is only valid until the next call.
+        """
+        n = len(images)
+        if out is None:
+            if n > self.max_batch:
+                raise ValueError("batch of %d exceeds max_batch=%d" % (n, self.max_batch))
+            if self._batch is None:
+                width, height = self.size
+                self._batch = np.empty((self.max_batch, height, width, 3), np.float32)
+            out = self._batch[:n]
+        for i, image in enumerate(images):
+            self._into(image, out[i])
+        return out
+
+    def new_batch(self, images):
+        """Like batch(), but into a freshly allocated array the caller owns."""
+        width, height = self.size
+        return self.batch(images, np.empty((len(images), height, width, 3), np.float32))
+
+
+# One single-image Preprocessor per request thread
+_local = threading.local()
+
+
+def thread_preprocessor():
+    preprocessor = getattr(_local, 'preprocessor', None)
+    if preprocessor is None:
+        preprocessor = _local.preprocessor = Preprocessor(max_batch=1)
+    return preprocessor
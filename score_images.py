@@ -0,0 +1,170 @@
+# Offline crop-health scoring over image directories
+#
+# USAGE:
+#     python score_images.py photos/ more_photos/ -o results.csv
+#     python score_images.py photos/ -o results.db --batch 64 --workers 8
+#
+# Walks the given directories for images, decodes them on a thread pool,
+# runs the model on large batches and appends each batch's results to the
+# output (CSV, or SQLite for a .db/.sqlite path) as soon as it is scored.
+# Files already present in the output are skipped, so re-running the same
+# command after a crash resumes where it stopped.
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from preprocessing import INPUT_SIZE
+from uploads import decode_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def find_images(roots):
+    for root in roots:
+        for directory, subdirs, files in os.walk(root):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(directory, name)
+
+
+class CsvResults:
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.done = set()
+        if exists:
+            with open(path, newline='', encoding='utf-8') as f:
+                self.done = {row['path'] for row in csv.DictReader(f)}
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(('path', 'status', 'result'))
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteResults:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                            path TEXT PRIMARY KEY,
+                            status TEXT NOT NULL,
+                            result TEXT)''')
+        self.done = {row[0] for row in self._conn.execute("SELECT path FROM results")}
+
+    def write(self, rows):
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO results (path, status, result) VALUES (?,?,?)", rows)
+
+    def close(self):
+        self._conn.close()
+
+
+def open_results(path):
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteResults(path)
+    return CsvResults(path)
+
+
+def read_image(path):
+    """Image decoded straight to (roughly) model size, as uploads are.
+
+    Returns None if it can't be decoded, or the OSError if it can't be read
+    (e.g. a dangling symlink or a file deleted mid-run).
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return e
+    return decode_image(data, INPUT_SIZE)
+
+
+def decoded(paths, pool, prefetch):
+    # Keep at most `prefetch` decodes in flight so memory stays bounded
+    pending = deque()
+    for path in paths:
+        pending.append((path, pool.submit(read_image, path)))
+        if len(pending) >= prefetch:
+            path, future = pending.popleft()
+            yield path, future.result()
+    while pending:
+        path, future = pending.popleft()
+        yield path, future.result()
+
+
+def score(args):
+    from interpretation import interpret_batch
+    from model_loader import ModelLoader
+    from preprocessing import Preprocessor
+
+    model = ModelLoader(args.model, args.backend).load()
+    results = open_results(args.output)
+    preprocessor = Preprocessor(max_batch=args.batch)
+    paths = [p for p in find_images(args.dirs) if p not in results.done]
+    print(f"{len(results.done):,} already scored, {len(paths):,} to go", file=sys.stderr)
+
+    start = time.perf_counter()
+    scored = 0
+    batch_paths, batch_images, rows = [], [], []
+
+    def flush():
+        nonlocal scored
+        if batch_images:
+            predictions = model.predict_on_batch(preprocessor.batch(batch_images))
+            for path, result in zip(batch_paths, interpret_batch(predictions)):
+                rows.append((path, 'ok', json.dumps(result)))
+        results.write(rows)
+        scored += len(rows)
+        elapsed = time.perf_counter() - start
+        print(f"\r{scored:,}/{len(paths):,} images  {scored / elapsed:,.1f} images/s",
+              end='', file=sys.stderr, flush=True)
+        batch_paths.clear()
+        batch_images.clear()
+        rows.clear()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            for path, image in decoded(paths, pool, args.workers * 4):
+                if isinstance(image, OSError):
+                    rows.append((path, 'error', json.dumps({"error": "Could not read image: %s" % image.strerror})))
+                elif image is None:
+                    rows.append((path, 'error', json.dumps({"error": "Could not decode image"})))
+                else:
+                    batch_paths.append(path)
+                    batch_images.append(image)
+                if len(batch_images) + len(rows) >= args.batch:
+                    flush()
+            flush()
+    finally:
+        print(file=sys.stderr)
+        results.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score crop images in bulk')
+    parser.add_argument('dirs', nargs='+', help='directories to scan (recursively)')
+    parser.add_argument('-o', '--output', default='scores.csv', help='.csv, or .db/.sqlite for SQLite')
+    parser.add_argument('--model', default=os.environ.get('CROP_MODEL', 'path_to_your_model.h5'))
+    parser.add_argument('--backend', default=os.environ.get('CROP_BACKEND'), help='keras or tflite (default: from extension)')
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='decode threads')
+    score(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
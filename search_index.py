@@ -0,0 +1,197 @@
+# In-memory search index for WorkFlow Hub lists
+#
+# Records are tokenized once when added, into an inverted index (token ->
+# {record id: field weight}). A query is tokenized the same way and every
+# query word must match each result, either:
+#   exactly                                  score 1.0 x field weight
+#   as a prefix of a word ("mai" -> "maintenance")    0.6
+#   within 1-2 typos ("maintenence"), found through a
+#   bigram index over the vocabulary                 0.4
+#   (only tried for words that aren't themselves in the vocabulary)
+# One-letter query words only match exactly, and the bigrams shared by a
+# large part of the vocabulary are left out of the typo search, so short
+# queries stay cheap on a large index.
+# Results are ranked by total score, then by insertion order. Adding,
+# updating or removing a record only touches that record's words.
+import bisect
+import heapq
+import itertools
+import re
+import threading
+from collections import Counter
+
+TOKEN = re.compile(r'\w+')
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+MIN_PREFIX_LENGTH = 2  # a one-letter query word only matches exactly
+MIN_FUZZY_LENGTH = 4
+FUZZY_CANDIDATES = 200  # closest words (by shared bigrams) checked per query word
+COMMON_GRAM = 0.02  # bigrams in more than this share of the vocabulary aren't counted
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def _bigrams(token):
+    padded = '^%s$' % token
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _within(a, b, max_edits):
+    """True if the Levenshtein distance between a and b is at most max_edits."""
+    if abs(len(a) - len(b)) > max_edits:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_edits:
+            return False
+        previous = current
+    return previous[-1] <= max_edits
+
+
+class SearchIndex:
+    def __init__(self, fields, facets=()):
+        """fields maps record field -> weight; facets are fields search() can filter on."""
+        self.fields = fields
+        self.facets = facets
+        self._docs = {}         # id -> {token: weight}
+        self._facet_values = {}  # id -> {facet: value}
+        self._order = {}        # id -> insertion sequence, for stable ranking
+        self._seq = itertools.count()
+        self._postings = {}     # token -> {id: weight}
+        self._vocabulary = []   # sorted tokens, for prefix lookups
+        self._grams = {}        # bigram -> set of tokens, for fuzzy lookups
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # Maintenance
+
+    def _weights(self, record):
+        weights = {}
+        for field, weight in self.fields.items():
+            value = record.get(field) or ''
+            text = ' '.join(value) if isinstance(value, (list, tuple)) else str(value)
+            for token in tokenize(text):
+                if weight > weights.get(token, 0):
+                    weights[token] = weight
+        return weights
+
+    def add(self, doc_id, record):
+        with self._lock:
+            if doc_id in self._docs:
+                self.remove(doc_id)
+            weights = self._weights(record)
+            self._docs[doc_id] = weights
+            self._facet_values[doc_id] = {facet: record.get(facet) for facet in self.facets}
+            self._order[doc_id] = next(self._seq)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocabulary, token)
+                    for gram in _bigrams(token):
+                        self._grams.setdefault(gram, set()).add(token)
+                postings[doc_id] = weight
+
+    def update(self, doc_id, record):
+        """Re-index a changed record, keeping its place in the ranking order."""
+        with self._lock:
+            order = self._order.get(doc_id)
+            self.add(doc_id, record)
+            if order is not None:
+                self._order[doc_id] = order
+
+    def remove(self, doc_id):
+        with self._lock:
+            weights = self._docs.pop(doc_id, None)
+            if weights is None:
+                return
+            del self._facet_values[doc_id]
+            del self._order[doc_id]
+            for token in weights:
+                postings = self._postings[token]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+                    for gram in _bigrams(token):
+                        tokens = self._grams[gram]
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._grams[gram]
+
+    # Queries
+
+    def _expand(self, term):
+        """(token, quality) pairs in the vocabulary that match a query word."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT
+        if len(term) >= MIN_PREFIX_LENGTH:
+            i = bisect.bisect_left(self._vocabulary, term)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+                matches.setdefault(self._vocabulary[i], PREFIX)
+                i += 1
+        # Typo matching only for words that aren't in the vocabulary
+        if term not in self._postings and len(term) >= MIN_FUZZY_LENGTH and not term.isdigit():
+            # An edit changes at most two bigrams, so a close word must
+            # share all but 2 * max_edits of the query word's bigrams
+            max_edits = 1 if len(term) < 8 else 2
+            grams = sorted((self._grams.get(gram, ()) for gram in _bigrams(term)), key=len)
+            needed = len(grams) - 2 * max_edits
+            # Very common bigrams ("^s", "in") would touch much of the
+            # vocabulary; skip them, lowering the bar by one for each, but
+            # always count enough that a close word shares at least one
+            common = max(len(self._vocabulary) * COMMON_GRAM, FUZZY_CANDIDATES)
+            while needed > 1 and len(grams[-1]) > common:
+                grams.pop()
+                needed -= 1
+            shared = Counter()
+            for tokens in grams:
+                shared.update(tokens)
+            for token, count in shared.most_common(FUZZY_CANDIDATES):
+                if count < needed:
+                    break
+                if token not in matches and _within(term, token, max_edits):
+                    matches[token] = FUZZY
+        return matches.items()
+
+    def search(self, query, limit=None, **facets):
+        """Ids of records matching every word of `query`, best first.
+
+        Keyword arguments filter on facet fields, e.g. status='active'.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for term in dict.fromkeys(terms):
+                term_scores = {}
+                for token, quality in self._expand(term):
+                    for doc_id, weight in self._postings[token].items():
+                        score = quality * weight
+                        if score > term_scores.get(doc_id, 0):
+                            term_scores[doc_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: scores[doc_id] + score
+                              for doc_id, score in term_scores.items() if doc_id in scores}
+                if not scores:
+                    return []
+            if facets:
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if all(self._facet_values[doc_id].get(f) == v for f, v in facets.items())}
+
+            def key(doc_id):
+                return -scores[doc_id], self._order[doc_id]
+
+            if limit is None:
+                return sorted(scores, key=key)
+            return heapq.nsmallest(limit, scores, key=key)
@@ -0,0 +1,92 @@
+# In-memory team directory for WorkFlow Hub
+#
+# Holds every team member once, keyed by id, with secondary indexes by
+# department, role, status and name. Each index maps a value to an
+# insertion-ordered {id: member} dict, so lookups, counts and add/update/
+# remove are all O(1) per member and pages never scan the whole team to
+# answer "who is in this department".
+INDEXED = ('department', 'role', 'status', 'name')
+
+
+class TeamDirectory:
+    def __init__(self, members=()):
+        self._members = {}
+        self._indexes = {field: {} for field in INDEXED}
+        for member in members:
+            self.add(member)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(list(self._members.values()))
+
+    def __contains__(self, member_id):
+        return member_id in self._members
+
+    def get(self, member_id):
+        return self._members.get(member_id)
+
+    # Maintenance
+
+    def _index(self, member):
+        for field in INDEXED:
+            self._indexes[field].setdefault(member.get(field), {})[member['id']] = member
+
+    def _unindex(self, member):
+        for field in INDEXED:
+            bucket = self._indexes[field].get(member.get(field))
+            if bucket is not None:
+                bucket.pop(member['id'], None)
+                if not bucket:
+                    del self._indexes[field][member.get(field)]
+
+    def add(self, member):
+        if member['id'] in self._members:
+            self._unindex(self._members[member['id']])
+        self._members[member['id']] = member
+        self._index(member)
+
+    def update(self, member_id, **changes):
+        """Apply changes to a member; the stored dict is replaced, not mutated."""
+        old = self._members[member_id]
+        member = dict(old, **changes)
+        self._unindex(old)
+        self._members[member_id] = member
+        self._index(member)
+        return member
+
+    def remove(self, member_id):
+        member = self._members.pop(member_id, None)
+        if member is not None:
+            self._unindex(member)
+
+    # Lookups
+
+    def _lookup(self, field, value):
+        return list(self._indexes[field].get(value, {}).values())
+
+    def in_department(self, department):
+        return self._lookup('department', department)
+
+    def with_role(self, role):
+        return self._lookup('role', role)
+
+    def with_status(self, status):
+        return self._lookup('status', status)
+
+    def named(self, name):
+        return self._lookup('name', name)
+
+    def count(self, field, value):
+        return len(self._indexes[field].get(value, ()))
+
+    def values(self, field):
+        """Distinct values of an indexed field, sorted."""
+        return sorted(v for v in self._indexes[field] if v is not None)
+
+    def departments(self):
+        return self.values('department')
+
+    def roles(self):
+        return self.values('role')
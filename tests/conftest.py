@@ -0,0 +1,19 @@
+# The app's modules live at the repository root
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def farmers_db(tmp_path):
+    """Point the db pool at a fresh, initialised database for one test."""
+    original = db.DB_PATH
+    db.configure(str(tmp_path / 'farmers.db'))
+    db.init_db()
+    yield db
+    db.configure(original)
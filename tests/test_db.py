@@ -0,0 +1,72 @@
+INSERT = "INSERT INTO queries (user_id, query, response) VALUES (?,?,?)"
+
+
+def seed(farmers_db, rows):
+    """rows: (user_id, answered) pairs; returns the new ids in order."""
+    return [farmers_db.execute(INSERT, (user_id, 'q', 'a' if answered else ''))
+            for user_id, answered in rows]
+
+
+def walk(farmers_db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = farmers_db.list_queries(cursor=cursor, limit=limit, **filters)
+        pages.append([row[0] for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_unanswered_then_answered_newest_first(farmers_db):
+    ids = seed(farmers_db, [(1, i % 3 == 0) for i in range(23)])
+    unanswered = [i for n, i in enumerate(ids) if n % 3][::-1]
+    answered = [i for n, i in enumerate(ids) if not n % 3][::-1]
+    pages = walk(farmers_db, 5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == unanswered + answered
+
+
+def test_exactly_full_last_page_has_no_cursor(farmers_db):
+    seed(farmers_db, [(1, False)] * 4 + [(1, True)] * 6)
+    assert [len(page) for page in walk(farmers_db, 5)] == [5, 5]
+
+
+def test_filters_by_user_and_unanswered_only(farmers_db):
+    ids = seed(farmers_db, [(1, False), (2, False), (1, True), (1, False), (2, True)])
+    assert sum(walk(farmers_db, 1, user_id=1), []) == [ids[3], ids[0], ids[2]]
+    assert sum(walk(farmers_db, 2, unanswered_only=True), []) == [ids[3], ids[1], ids[0]]
+
+
+def test_cursor_is_stable_under_new_rows(farmers_db):
+    ids = seed(farmers_db, [(1, False)] * 6)
+    first, cursor = farmers_db.list_queries(cursor=None, limit=3)
+    seed(farmers_db, [(1, False)] * 2)  # newer rows land before the cursor
+    second, cursor = farmers_db.list_queries(cursor=cursor, limit=3)
+    assert [row[0] for row in first] == ids[:2:-1]
+    assert [row[0] for row in second] == ids[2::-1]
+    assert cursor is None
+
+
+def test_unknown_cursor_starts_from_the_top(farmers_db):
+    ids = seed(farmers_db, [(1, False)] * 3)
+    rows, _ = farmers_db.list_queries(cursor='bogus', limit=10)
+    assert [row[0] for row in rows] == ids[::-1]
+
+
+def test_search_is_limited_to_the_owner(farmers_db):
+    mine = farmers_db.execute(INSERT, (1, 'irrigation schedule', ''))
+    theirs = farmers_db.execute(INSERT, (2, 'irrigation pump', 'check the valve'))
+
+    def found(owner):
+        return [row[0] for row in farmers_db.search_queries('irrig', owner=owner)[0]]
+
+    assert found(1) == [mine]
+    assert found(2) == [theirs]
+    assert sorted(found(None)) == [mine, theirs]  # experts search everything
+
+
+def test_parse_cursor_treats_junk_as_the_first_page():
+    import db
+    assert db.parse_cursor('a42') == ('a', 42)
+    assert db.parse_cursor('u7') == ('u', 7)
+    for junk in (None, '', 'a', 'x12', 'a"b', 'u-3', 'u²', 'a 1'):
+        assert db.parse_cursor(junk) == ('u', None)
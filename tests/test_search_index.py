@@ -0,0 +1,134 @@
+import time
+
+import search_index
+from search_index import SearchIndex
+
+FIELDS = {'title': 1.0, 'notes': 0.5}
+
+
+def make_index(*titles):
+    index = SearchIndex(FIELDS, facets=('status',))
+    for i, title in enumerate(titles):
+        index.add(i, {'title': title, 'status': 'active'})
+    return index
+
+
+def count_edit_checks(monkeypatch):
+    calls = []
+    within = search_index._within
+
+    def counting(a, b, max_edits):
+        calls.append(b)
+        return within(a, b, max_edits)
+
+    monkeypatch.setattr(search_index, '_within', counting)
+    return calls
+
+
+def test_exact_beats_prefix_beats_fuzzy():
+    index = make_index('maintenance schedule', 'main gate', 'mainly')
+    # "main" is exact for 1, a prefix of "maintenance" (0) and "mainly" (2)
+    assert index.search('main') == [1, 0, 2]
+    assert index.search('maintenence') == [0]  # one typo
+
+
+def test_field_weight_and_insertion_order_break_ties():
+    index = SearchIndex(FIELDS)
+    index.add('a', {'title': 'audit', 'notes': 'harvest'})
+    index.add('b', {'title': 'harvest'})
+    index.add('c', {'title': 'harvest plan'})
+    assert index.search('harvest') == ['b', 'c', 'a']
+    assert index.search('harvest', limit=1) == ['b']
+
+
+def test_every_query_word_must_match_and_facets_filter():
+    index = make_index('irrigation check', 'irrigation repair')
+    index.add(2, {'title': 'irrigation check', 'status': 'completed'})
+    assert index.search('irrigation chec') == [0, 2]
+    assert index.search('irrigation chec', status='completed') == [2]
+    assert index.search('irrigation nothing') == []
+
+
+def test_fuzzy_only_checks_the_closest_candidates(monkeypatch):
+    # 60 words share 7 of the query word's 9 bigrams; only 5 get an edit-distance check
+    index = make_index(*('planting%d' % i for i in range(60)), 'ploughing')
+    monkeypatch.setattr(search_index, 'FUZZY_CANDIDATES', 5)
+    calls = count_edit_checks(monkeypatch)
+    results = index.search('plantinq')
+    assert 0 < len(calls) <= 5
+    assert 'ploughing' not in calls  # too few shared bigrams to be a candidate
+    assert set(results) <= set(range(10))  # "planting0".."planting9" are 2 edits away
+
+
+def test_fuzzy_skipped_for_known_short_and_numeric_words(monkeypatch):
+    index = make_index('fertilizer', 'seed', 'lot 12345')
+    calls = count_edit_checks(monkeypatch)
+    assert index.search('fertilizer') == [0]
+    assert index.search('sed') == []  # below MIN_FUZZY_LENGTH
+    assert index.search('12346') == []
+    assert calls == []
+
+
+def test_remove_drops_unused_vocabulary_and_bigrams():
+    index = make_index('pruning orchard', 'orchard survey')
+    index.remove(0)
+    assert index.search('pruning') == []
+    assert 'pruning' not in index._postings
+    assert 'pruning' not in index._vocabulary
+    assert not any('pruning' in tokens for tokens in index._grams.values())
+    assert '^p' not in index._grams  # no other word starts with "p"
+    # Shared words survive until their last record goes
+    assert index.search('orchard') == [1]
+    index.remove(1)
+    assert index._postings == {} and index._vocabulary == [] and index._grams == {}
+    assert len(index) == 0
+
+
+def test_update_reindexes_and_keeps_ranking_position():
+    index = make_index('weed control', 'weed survey')
+    index.update(0, {'title': 'pest survey', 'status': 'completed'})
+    assert index.search('control') == []
+    assert 'control' not in index._vocabulary
+    assert not any('control' in tokens for tokens in index._grams.values())
+    assert index.search('survey') == [0, 1]  # 0 keeps its original place
+    assert index.search('survey', status='active') == [1]
+
+
+
+def large_index(records=20000):
+    # 5000 words like "sabcing": "^s", "si", "in", "ng" and "g$" are
+    # shared by the whole vocabulary
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = ['s%s%s%sing' % (letters[i % 26], letters[i // 26 % 26], letters[i // 676]) for i in range(5000)]
+    index = SearchIndex(FIELDS)
+    for i in range(records):
+        index.add(i, {'title': ' '.join(words[(i * 3 + k) % len(words)] for k in range(3))})
+    return index, words
+
+
+def test_short_queries_on_a_large_index_stay_cheap(monkeypatch):
+    index, words = large_index()
+    counted = []
+
+    class CountingCounter(search_index.Counter):
+        def update(self, tokens=None):
+            if tokens is not None:
+                counted.append(len(tokens))
+            super().update(tokens)
+
+    monkeypatch.setattr(search_index, 'Counter', CountingCounter)
+    calls = count_edit_checks(monkeypatch)
+
+    start = time.perf_counter()
+    assert index.search('s', limit=10) == []  # one letter: no prefix expansion
+    assert len(index.search('sa', limit=10)) == 10
+    typo = words[1234][:1] + '0' + words[1234][2:]  # matches 26 words one edit away
+    found = index.search(typo)
+    elapsed = time.perf_counter() - start
+
+    assert set(index._postings[words[1234]]) <= set(found)
+    assert len(calls) <= search_index.FUZZY_CANDIDATES
+    # The bigrams every word shares were never counted
+    assert len(index._vocabulary) not in counted
+    assert sum(counted) < len(index._vocabulary)
+    assert elapsed < 0.1
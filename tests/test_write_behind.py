@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+
+from write_behind import WriteBehindQueue
+
+INSERT = "INSERT INTO queries (user_id, query, response) VALUES (?,?,?)"
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Sizes of the batches the writer commits."""
+    sizes = []
+    commit = WriteBehindQueue._commit
+
+    def recording(self, writes):
+        sizes.append(len(writes))
+        commit(self, writes)
+
+    monkeypatch.setattr(WriteBehindQueue, '_commit', recording)
+    return sizes
+
+
+def questions(farmers_db):
+    return [row[0] for row in farmers_db.query("SELECT query FROM queries ORDER BY id")]
+
+
+def test_burst_is_committed_as_one_batch(farmers_db, batches):
+    writer = WriteBehindQueue(flush_interval=0.5, max_batch=100)
+    committed = []
+    for i in range(20):
+        writer.submit(INSERT, (7, 'q%d' % i, ''), user_id=7, on_commit=committed.append)
+    assert writer.wait_for(7)
+    writer.close()
+    assert batches == [20]
+    assert questions(farmers_db) == ['q%d' % i for i in range(20)]
+    assert committed == [row[0] for row in farmers_db.query("SELECT id FROM queries ORDER BY id")]
+
+
+def test_batches_are_capped_at_max_batch(farmers_db, batches):
+    writer = WriteBehindQueue(flush_interval=0.5, max_batch=4)
+    for i in range(10):
+        writer.submit(INSERT, (1, 'q%d' % i, ''))
+    writer.flush()
+    writer.close()
+    assert batches == [4, 4, 2]
+    assert len(questions(farmers_db)) == 10
+
+
+def test_bad_statement_is_dropped_and_the_rest_retried(farmers_db, batches, caplog):
+    writer = WriteBehindQueue(flush_interval=0.5, max_batch=100)
+    committed = []
+    writer.submit(INSERT, (1, 'before', ''), on_commit=committed.append)
+    writer.submit(INSERT, (1, None, ''), on_commit=committed.append)  # query is NOT NULL
+    writer.submit(INSERT, (1, 'after', ''), on_commit=committed.append)
+    with caplog.at_level(logging.ERROR, logger='write_behind'):
+        writer.close()
+    assert batches == [3]
+    assert questions(farmers_db) == ['before', 'after']
+    assert len(committed) == 2
+    assert 'dropped statement' in caplog.text
+
+
+def test_submit_after_close_writes_synchronously(farmers_db):
+    writer = WriteBehindQueue(flush_interval=0.5)
+    writer.close()
+    committed = []
+    writer.submit(INSERT, (1, 'late', ''), on_commit=committed.append)
+    assert questions(farmers_db) == ['late']
+    assert len(committed) == 1
@@ -0,0 +1,106 @@
+# Bounded upload handling for the crop-health service
+#
+# Uploads are checked while they stream in rather than after buffering:
+# the part's Content-Type header is checked when the file part starts, its
+# first bytes must carry a known image signature, and the part stops being
+# accepted once it passes the size limit. Oversized images are decoded at
+# reduced resolution (JPEG decodes at 1/2, 1/4 or 1/8 scale directly from
+# the DCT), and images whose header claims more than max_pixels are
+# refused before any pixels are allocated.
+import io
+import struct
+
+import cv2
+import numpy as np
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+)
+ACCEPTED_TYPES = ('image/', 'application/octet-stream')
+REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+SNIFF_BYTES = 12
+
+
+def sniff(head):
+    """Image format from the first bytes of a file, or None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for magic, kind in SIGNATURES:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+class UploadStream(io.BytesIO):
+    """In-memory file part that rejects non-images and overlong parts as they arrive."""
+
+    def __init__(self, max_bytes=None):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.format = None
+
+    def write(self, data):
+        if self.format is None and self.tell() + len(data) >= SNIFF_BYTES:
+            self.format = sniff(self.getvalue() + bytes(data[:SNIFF_BYTES]))
+            if self.format is None:
+                raise UnsupportedMediaType("upload is not a supported image")
+        if self.max_bytes is not None and self.tell() + len(data) > self.max_bytes:
+            raise RequestEntityTooLarge()
+        return super().write(data)
+
+
+def check_content_type(content_type):
+    if content_type and not content_type.startswith(ACCEPTED_TYPES):
+        raise UnsupportedMediaType("expected an image, got %s" % content_type)
+
+
+def image_size(data):
+    """(width, height) read from a JPEG/PNG/BMP header, or None."""
+    with memoryview(data) as data:
+        if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+            return struct.unpack('>II', data[16:24])
+        if data[:2] == b'BM' and len(data) >= 26:
+            width, height = struct.unpack('<ii', data[18:26])
+            return width, abs(height)
+        if data[:2] == b'\xff\xd8':
+            i = 2
+            while i + 9 <= len(data):
+                if data[i] != 0xFF:
+                    return None
+                marker = data[i + 1]
+                if marker == 0xFF:  # fill byte
+                    i += 1
+                    continue
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                    return width, height
+                i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+        return None
+
+
+def decode_flag(size, target):
+    # Largest reduction that still leaves at least `target` pixels each way
+    if size is None:
+        return cv2.IMREAD_COLOR
+    (width, height), (target_width, target_height) = size, target
+    for factor, flag in REDUCED:
+        if width // factor >= target_width and height // factor >= target_height:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(data, target=None, max_pixels=None):
+    """Decode image bytes, downscaled toward `target` (width, height); None if undecodable.
+
+    Raises RequestEntityTooLarge if the header claims more than max_pixels.
+    """
+    size = image_size(data)
+    if max_pixels and size and size[0] * size[1] > max_pixels:
+        raise RequestEntityTooLarge("image is %dx%d, over the %d pixel limit" % (size + (max_pixels,)))
+    flag = decode_flag(size, target) if target else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
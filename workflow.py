@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import json
 from typing import Dict, List, Optional
 import uuid
+from workflow_store import Repository
 
 # Configure Streamlit page
 st.set_page_config(
@@ -19,97 +20,103 @@ st.set_page_config(
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = 'dashboard'
 
-if 'departments' not in st.session_state:
-    st.session_state.departments = [
-        {"id": "1", "name": "Operations", "description": "Day-to-day operations and management", "color": "blue"},
-        {"id": "2", "name": "Production", "description": "Manufacturing and production activities", "color": "green"},
-        {"id": "3", "name": "Quality Control", "description": "Quality assurance and testing", "color": "purple"},
-        {"id": "4", "name": "Safety", "description": "Workplace safety and compliance", "color": "red"},
-        {"id": "5", "name": "Logistics", "description": "Supply chain and warehouse", "color": "orange"},
-    ]
+# Sample data for a new, empty database (see workflow_store.py)
+SEED = {}
+SEED['departments'] = [
+    {"id": "1", "name": "Operations", "description": "Day-to-day operations and management", "color": "blue"},
+    {"id": "2", "name": "Production", "description": "Manufacturing and production activities", "color": "green"},
+    {"id": "3", "name": "Quality Control", "description": "Quality assurance and testing", "color": "purple"},
+    {"id": "4", "name": "Safety", "description": "Workplace safety and compliance", "color": "red"},
+    {"id": "5", "name": "Logistics", "description": "Supply chain and warehouse", "color": "orange"},
+]
 
-if 'team_members' not in st.session_state:
-    st.session_state.team_members = [
-        {
-            "id": "1", "name": "Sarah Johnson", "role": "Operations Manager", "department": "Operations",
-            "email": "sarah.johnson@company.com", "level": 5, "status": "active",
-            "skills": ["Leadership", "Process Management", "Quality Control"], "completion_rate": 95
-        },
-        {
-            "id": "2", "name": "Mike Davis", "role": "Senior Technician", "department": "Production",
-            "email": "mike.davis@company.com", "level": 3, "status": "active",
-            "skills": ["Machine Operation", "Troubleshooting", "Training"], "completion_rate": 72
-        },
-        {
-            "id": "3", "name": "Lisa Chen", "role": "Quality Inspector", "department": "Quality Control",
-            "email": "lisa.chen@company.com", "level": 3, "status": "active",
-            "skills": ["Quality Testing", "Documentation", "Analysis"], "completion_rate": 98
-        },
-        {
-            "id": "4", "name": "John Smith", "role": "Team Lead", "department": "Production",
-            "email": "john.smith@company.com", "level": 4, "status": "busy",
-            "skills": ["Team Management", "Production Planning", "Safety"], "completion_rate": 85
-        },
-        {
-            "id": "5", "name": "Emma Brown", "role": "Safety Coordinator", "department": "Safety",
-            "email": "emma.brown@company.com", "level": 4, "status": "active",
-            "skills": ["Safety Protocols", "Training", "Compliance"], "completion_rate": 91
-        },
-        {
-            "id": "6", "name": "Tom Wilson", "role": "Technician", "department": "Production",
-            "email": "tom.wilson@company.com", "level": 2, "status": "offline",
-            "skills": ["Equipment Maintenance", "Basic Repairs"], "completion_rate": 78
-        }
-    ]
+SEED['team_members'] = [
+    {
+        "id": "1", "name": "Sarah Johnson", "role": "Operations Manager", "department": "Operations",
+        "email": "sarah.johnson@company.com", "level": 5, "status": "active",
+        "skills": ["Leadership", "Process Management", "Quality Control"], "completion_rate": 95
+    },
+    {
+        "id": "2", "name": "Mike Davis", "role": "Senior Technician", "department": "Production",
+        "email": "mike.davis@company.com", "level": 3, "status": "active",
+        "skills": ["Machine Operation", "Troubleshooting", "Training"], "completion_rate": 72
+    },
+    {
+        "id": "3", "name": "Lisa Chen", "role": "Quality Inspector", "department": "Quality Control",
+        "email": "lisa.chen@company.com", "level": 3, "status": "active",
+        "skills": ["Quality Testing", "Documentation", "Analysis"], "completion_rate": 98
+    },
+    {
+        "id": "4", "name": "John Smith", "role": "Team Lead", "department": "Production",
+        "email": "john.smith@company.com", "level": 4, "status": "busy",
+        "skills": ["Team Management", "Production Planning", "Safety"], "completion_rate": 85
+    },
+    {
+        "id": "5", "name": "Emma Brown", "role": "Safety Coordinator", "department": "Safety",
+        "email": "emma.brown@company.com", "level": 4, "status": "active",
+        "skills": ["Safety Protocols", "Training", "Compliance"], "completion_rate": 91
+    },
+    {
+        "id": "6", "name": "Tom Wilson", "role": "Technician", "department": "Production",
+        "email": "tom.wilson@company.com", "level": 2, "status": "offline",
+        "skills": ["Equipment Maintenance", "Basic Repairs"], "completion_rate": 78
+    }
+]
 
-if 'reminders' not in st.session_state:
-    st.session_state.reminders = [
-        {
-            "id": "1", "title": "Weekly Team Meeting", "description": "Mandatory team meeting to discuss project updates",
-            "assigned_to": ["Sarah Johnson", "Mike Davis", "Lisa Chen"], "due_date": "2024-12-13",
-            "due_time": "14:00", "priority": "high", "status": "active", "type": "meeting",
-            "created_date": "2024-12-10", "responses": 2
-        },
-        {
-            "id": "2", "title": "Equipment Maintenance Check", "description": "Monthly maintenance check for production equipment",
-            "assigned_to": ["Mike Davis", "Tom Wilson"], "due_date": "2024-12-14",
-            "due_time": "09:00", "priority": "medium", "status": "active", "type": "maintenance",
-            "created_date": "2024-12-09", "responses": 0
-        },
-        {
-            "id": "3", "title": "Safety Training Completion", "description": "Complete mandatory safety training module",
-            "assigned_to": ["All Workers"], "due_date": "2024-12-20",
-            "due_time": "17:00", "priority": "high", "status": "active", "type": "training",
-            "created_date": "2024-12-08", "responses": 15
-        }
-    ]
+SEED['reminders'] = [
+    {
+        "id": "1", "title": "Weekly Team Meeting", "description": "Mandatory team meeting to discuss project updates",
+        "assigned_to": ["Sarah Johnson", "Mike Davis", "Lisa Chen"], "due_date": "2024-12-13",
+        "due_time": "14:00", "priority": "high", "status": "active", "type": "meeting",
+        "created_date": "2024-12-10", "responses": 2
+    },
+    {
+        "id": "2", "title": "Equipment Maintenance Check", "description": "Monthly maintenance check for production equipment",
+        "assigned_to": ["Mike Davis", "Tom Wilson"], "due_date": "2024-12-14",
+        "due_time": "09:00", "priority": "medium", "status": "active", "type": "maintenance",
+        "created_date": "2024-12-09", "responses": 0
+    },
+    {
+        "id": "3", "title": "Safety Training Completion", "description": "Complete mandatory safety training module",
+        "assigned_to": ["All Workers"], "due_date": "2024-12-20",
+        "due_time": "17:00", "priority": "high", "status": "active", "type": "training",
+        "created_date": "2024-12-08", "responses": 15
+    }
+]
 
-if 'workflows' not in st.session_state:
-    st.session_state.workflows = [
-        {
-            "id": "1", "name": "New Employee Onboarding", "description": "Complete onboarding process for new team members",
-            "category": "HR", "is_active": True, "trigger": "manual", "steps": 3,
-            "created_at": "2024-12-01", "last_used": "2024-12-10"
-        },
-        {
-            "id": "2", "name": "Quality Control Process", "description": "Standard quality control workflow for production items",
-            "category": "Quality", "is_active": True, "trigger": "event", "steps": 2,
-            "created_at": "2024-11-15", "last_used": "2024-12-12"
-        },
-        {
-            "id": "3", "name": "Equipment Maintenance", "description": "Scheduled maintenance workflow for critical equipment",
-            "category": "Maintenance", "is_active": True, "trigger": "scheduled", "steps": 3,
-            "created_at": "2024-11-20", "last_used": "2024-12-11"
-        }
-    ]
+SEED['workflows'] = [
+    {
+        "id": "1", "name": "New Employee Onboarding", "description": "Complete onboarding process for new team members",
+        "category": "HR", "is_active": True, "trigger": "manual", "steps": 3,
+        "created_at": "2024-12-01", "last_used": "2024-12-10"
+    },
+    {
+        "id": "2", "name": "Quality Control Process", "description": "Standard quality control workflow for production items",
+        "category": "Quality", "is_active": True, "trigger": "event", "steps": 2,
+        "created_at": "2024-11-15", "last_used": "2024-12-12"
+    },
+    {
+        "id": "3", "name": "Equipment Maintenance", "description": "Scheduled maintenance workflow for critical equipment",
+        "category": "Maintenance", "is_active": True, "trigger": "scheduled", "steps": 3,
+        "created_at": "2024-11-20", "last_used": "2024-12-11"
+    }
+]
 
-if 'chat_messages' not in st.session_state:
-    st.session_state.chat_messages = [
-        {
-            "role": "assistant",
-            "content": "Hello! I'm your AI management assistant. I can help you with worker management, scheduling reminders, analyzing team performance, and providing insights. How can I assist you today?"
-        }
-    ]
+GREETING = {
+    "role": "assistant",
+    "content": "Hello! I'm your AI management assistant. I can help you with worker management, scheduling reminders, analyzing team performance, and providing insights. How can I assist you today?"
+}
+
+# One shared repository per server process; every session reads through it
+@st.cache_resource
+def get_repository():
+    return Repository(seed=SEED)
+
+repo = get_repository()
+
+# Each browser session keeps only its chat conversation id
+if 'conversation_id' not in st.session_state:
+    st.session_state.conversation_id = str(uuid.uuid4())
 
 def main():
     # Custom CSS for styling
@@ -192,76 +199,83 @@ def main():
     elif st.session_state.active_tab == 'settings':
         show_settings()
 
+# Dashboard figures, rebuilt only when team_members changes: the key is the
+# table's change counter, so unrelated reruns reuse the cached figures
+@st.cache_data(max_entries=4)
+def dashboard_figures(team_version):
+    stats = pd.DataFrame(repo.department_stats(), columns=['department', 'members', 'completion_rate'])
+    performance = px.bar(
+        stats,
+        x='department',
+        y='completion_rate',
+        title='Average Completion Rate by Department',
+        color='completion_rate',
+        color_continuous_scale='RdYlGn'
+    )
+    performance.update_layout(height=400)
+    distribution = px.pie(
+        stats,
+        values='members',
+        names='department',
+        title='Team Members by Department'
+    )
+    distribution.update_layout(height=400)
+    return performance, distribution
+
 def show_dashboard():
     st.markdown('<div class="main-header"><h1>📊 Dashboard</h1><p>Overview of your team and reminders</p></div>', unsafe_allow_html=True)
     
-    # Key metrics
+    # Key metrics, all read from the maintained aggregates
+    today = datetime.now().date()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    reminder_counts = repo.reminder_status_counts()
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             label="👥 Total Workers",
-            value=len(st.session_state.team_members),
-            delta="2 new this month"
+            value=sum(members for _, members, _ in repo.department_stats())
         )
     
     with col2:
-        active_reminders = len([r for r in st.session_state.reminders if r['status'] == 'active'])
+        active_reminders = reminder_counts.get('active', 0)
         st.metric(
             label="🔔 Active Reminders",
             value=active_reminders,
-            delta="3 due today"
+            delta=f"{repo.active_due_count(today.isoformat())} due today"
         )
     
     with col3:
-        completed_today = 8
+        completed_today = repo.completed_on(today.isoformat())
+        completed_yesterday = repo.completed_on(yesterday)
         st.metric(
             label="✅ Completed Today",
             value=completed_today,
-            delta="↗️ +2 from yesterday"
+            delta=f"{completed_today - completed_yesterday:+d} from yesterday"
         )
     
     with col4:
-        pending_tasks = 4
+        pending_tasks = repo.active_due_count(today.isoformat(), overdue=True)
         st.metric(
             label="⏳ Pending",
             value=pending_tasks,
-            delta="↘️ -1 from yesterday"
+            delta=f"{repo.active_due_count(yesterday, overdue=True)} overdue",
+            delta_color="inverse"
         )
     
     st.markdown("---")
     
     # Charts and analytics
+    performance_fig, distribution_fig = dashboard_figures(repo.version('team_members'))
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📈 Team Performance")
-        
-        # Create performance chart
-        members_df = pd.DataFrame(st.session_state.team_members)
-        fig = px.bar(
-            members_df, 
-            x='name', 
-            y='completion_rate',
-            title='Completion Rates by Team Member',
-            color='completion_rate',
-            color_continuous_scale='RdYlGn'
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(performance_fig, use_container_width=True)
     
     with col2:
         st.subheader("📊 Department Distribution")
-        
-        # Department pie chart
-        dept_counts = members_df['department'].value_counts()
-        fig = px.pie(
-            values=dept_counts.values,
-            names=dept_counts.index,
-            title='Team Members by Department'
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(distribution_fig, use_container_width=True)
     
     # Recent activity
     st.subheader("🕒 Recent Activity")
@@ -284,29 +298,73 @@ def show_dashboard():
                 status_color = "🟢" if activity['status'] == 'completed' else "🔴"
                 st.write(f"{status_color} {activity['time']}")
 
+# List pagination: cards and expanders are rendered for one page at a time,
+# so rerun cost is bounded by the page size rather than the data size
+PAGE_SIZES = [12, 24, 48, 96]
+TABLE_PAGE_SIZES = [100, 500, 1000]
+WORKS_WITH_SHOWN = 10  # colleagues named on a Team Connections card
+
+def list_controls(key, total, filters):
+    """View mode, page size and page pickers for a list; returns (mode, offset, limit)."""
+    # Changing the filters starts over at page 1
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_page"] = 1
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
+    with col1:
+        mode = st.radio("View", ["Cards", "Table"], horizontal=True, key=f"{key}_mode")
+    with col2:
+        sizes = TABLE_PAGE_SIZES if mode == "Table" else PAGE_SIZES
+        page_size = st.selectbox("Per page", sizes, key=f"{key}_page_size_{mode}")
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with col3:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    offset = (page - 1) * page_size
+    with col4:
+        st.markdown(f"Showing {min(offset + 1, total)}–{min(offset + page_size, total)} of {total}")
+    return mode, offset, page_size
+
 def show_workers():
     st.markdown('<div class="main-header"><h1>👥 Team Members</h1><p>Manage your team members and track their progress</p></div>', unsafe_allow_html=True)
     
+    team = repo.directory()
+
     # Search and filters
     col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
-        search_term = st.text_input("🔍 Search workers...", placeholder="Enter name or role")
+        search_term = st.text_input("🔍 Search workers...", placeholder="Enter name, role or skill")
     with col2:
-        department_filter = st.selectbox("Department", ["All"] + list(set([m['department'] for m in st.session_state.team_members])))
+        department_filter = st.selectbox("Department", ["All"] + team.departments())
     with col3:
         if st.button("➕ Add Worker", type="primary"):
             st.session_state.show_add_worker = True
     
-    # Filter workers
-    filtered_members = st.session_state.team_members
+    # Filter workers; searches go through the prebuilt index, best match first
+    department = None if department_filter == "All" else department_filter
     if search_term:
-        filtered_members = [m for m in filtered_members if search_term.lower() in m['name'].lower() or search_term.lower() in m['role'].lower()]
-    if department_filter != "All":
-        filtered_members = [m for m in filtered_members if m['department'] == department_filter]
+        facets = {} if department is None else {"department": department}
+        matching_ids = repo.member_search().search(search_term, **facets)
+        filtered_members = [m for m in map(team.get, matching_ids) if m is not None]
+    else:
+        filtered_members = list(team) if department is None else team.in_department(department)
+    
+    mode, offset, limit = list_controls("workers", len(filtered_members), (search_term, department_filter))
+    page_members = filtered_members[offset:offset + limit]
+    
+    # Compact mode: one dataframe for the whole page
+    if mode == "Table":
+        st.dataframe(
+            pd.DataFrame(page_members, columns=['name', 'role', 'department', 'email', 'status', 'completion_rate', 'skills']),
+            use_container_width=True,
+            hide_index=True
+        )
+        return
     
     # Display workers in a grid
     cols = st.columns(3)
-    for i, member in enumerate(filtered_members):
+    for i, member in enumerate(page_members):
         with cols[i % 3]:
             with st.container():
                 st.markdown(f"### {member['name']}")
@@ -348,15 +406,33 @@ def show_reminders():
         if st.button("➕ Create Reminder", type="primary"):
             st.session_state.active_tab = 'create-reminder'
     
-    # Filter reminders
-    filtered_reminders = st.session_state.reminders
+    # Filter reminders; only the current page is loaded from storage.
+    # Searches rank ids through the prebuilt index, best match first.
+    status = None if status_filter == "All" else status_filter
     if search_term:
-        filtered_reminders = [r for r in filtered_reminders if search_term.lower() in r['title'].lower()]
-    if status_filter != "All":
-        filtered_reminders = [r for r in filtered_reminders if r['status'] == status_filter]
+        facets = {} if status is None else {"status": status}
+        matching_ids = repo.reminder_search().search(search_term, **facets)
+        total = len(matching_ids)
+    else:
+        total = repo.reminder_count(status)
+    
+    mode, offset, limit = list_controls("reminders", total, (search_term, status_filter))
+    if search_term:
+        page_reminders = repo.reminders_by_id(matching_ids[offset:offset + limit])
+    else:
+        page_reminders = repo.reminders(status=status, limit=limit, offset=offset)
+    
+    # Compact mode: one dataframe for the whole page
+    if mode == "Table":
+        st.dataframe(
+            pd.DataFrame(page_reminders, columns=['title', 'priority', 'status', 'type', 'due_date', 'due_time', 'assigned_to', 'responses']),
+            use_container_width=True,
+            hide_index=True
+        )
+        return
     
     # Display reminders
-    for reminder in filtered_reminders:
+    for reminder in page_reminders:
         with st.expander(f"{reminder['title']} - {reminder['priority'].title()} Priority"):
             col1, col2 = st.columns([2, 1])
             
@@ -372,6 +448,11 @@ def show_reminders():
                 st.markdown(f"**Status:** {reminder['status'].title()}")
                 st.markdown(f"**Responses:** {reminder['responses']}")
                 
+                if reminder['status'] != 'completed':
+                    if st.button("✅ Complete", key=f"complete_{reminder['id']}"):
+                        repo.complete_reminder(reminder['id'])
+                        st.rerun()
+                
                 col1_btn, col2_btn = st.columns(2)
                 with col1_btn:
                     st.button("✏️ Edit", key=f"edit_{reminder['id']}")
@@ -395,10 +476,10 @@ def show_ai_chat():
     for i, (label, action) in enumerate(quick_actions):
         with [col1, col2, col3, col4][i]:
             if st.button(label, use_container_width=True):
-                st.session_state.chat_messages.append({"role": "user", "content": action})
+                repo.add_chat_message(st.session_state.conversation_id, "user", action)
                 # Generate AI response
                 response = generate_ai_response(action)
-                st.session_state.chat_messages.append({"role": "assistant", "content": response})
+                repo.add_chat_message(st.session_state.conversation_id, "assistant", response)
     
     st.markdown("---")
     
@@ -406,7 +487,7 @@ def show_ai_chat():
     st.subheader("💬 Chat")
     
     # Display chat messages
-    for message in st.session_state.chat_messages:
+    for message in [GREETING] + repo.chat_messages(st.session_state.conversation_id):
         if message["role"] == "user":
             st.markdown(f"**You:** {message['content']}")
         else:
@@ -419,9 +500,9 @@ def show_ai_chat():
         submitted = st.form_submit_button("Send")
         
         if submitted and user_input:
-            st.session_state.chat_messages.append({"role": "user", "content": user_input})
+            repo.add_chat_message(st.session_state.conversation_id, "user", user_input)
             response = generate_ai_response(user_input)
-            st.session_state.chat_messages.append({"role": "assistant", "content": response})
+            repo.add_chat_message(st.session_state.conversation_id, "assistant", response)
             st.rerun()
 
 def generate_ai_response(user_input: str) -> str:
@@ -510,7 +591,7 @@ def show_create_reminder():
         st.subheader("Assign Workers")
         
         # Multi-select for workers
-        worker_names = [member['name'] for member in st.session_state.team_members]
+        worker_names = [member['name'] for member in repo.members()]
         selected_workers = st.multiselect("Select Team Members", worker_names)
         
         if st.checkbox("Select All"):
@@ -533,7 +614,7 @@ def show_create_reminder():
                 "responses": 0
             }
             
-            st.session_state.reminders.append(new_reminder)
+            repo.add_reminder(new_reminder)
             st.success("Reminder created successfully!")
             st.session_state.active_tab = 'reminders'
             st.rerun()
@@ -542,6 +623,7 @@ def show_organization_setup():
     st.markdown('<div class="main-header"><h1>🏢 Organization Setup</h1><p>Configure your organizational structure, roles, and relationships</p></div>', unsafe_allow_html=True)
     
     tab1, tab2, tab3 = st.tabs(["Departments", "Roles", "Templates"])
+    team = repo.directory()
     
     with tab1:
         st.subheader("Departments")
@@ -564,12 +646,12 @@ def show_organization_setup():
                             "description": dept_desc,
                             "color": dept_color
                         }
-                        st.session_state.departments.append(new_dept)
+                        repo.add_department(new_dept)
                         st.success(f"Department '{dept_name}' added successfully!")
                         st.rerun()
         
         # Display departments
-        for dept in st.session_state.departments:
+        for dept in repo.departments():
             with st.container():
                 col1, col2, col3 = st.columns([2, 3, 1])
                 with col1:
@@ -577,7 +659,7 @@ def show_organization_setup():
                     st.markdown(f"Color: {dept['color']}")
                 with col2:
                     st.markdown(f"**Description:** {dept['description']}")
-                    member_count = len([m for m in st.session_state.team_members if m['department'] == dept['name']])
+                    member_count = team.count('department', dept['name'])
                     st.markdown(f"**Members:** {member_count}")
                 with col3:
                     st.button("✏️ Edit", key=f"edit_dept_{dept['id']}")
@@ -589,10 +671,10 @@ def show_organization_setup():
         st.info("Role management functionality - define custom roles, authority levels, and permissions for your organization.")
         
         # Display current roles from team members
-        roles = list(set([member['role'] for member in st.session_state.team_members]))
+        roles = team.roles()
         for role in roles:
             with st.expander(f"Role: {role}"):
-                members_with_role = [m for m in st.session_state.team_members if m['role'] == role]
+                members_with_role = team.with_role(role)
                 st.write(f"**Members with this role:** {len(members_with_role)}")
                 for member in members_with_role:
                     st.write(f"• {member['name']} ({member['department']})")
@@ -620,12 +702,14 @@ def show_team_connections():
     st.markdown('<div class="main-header"><h1>🌐 Team Connections</h1><p>Visualize and manage relationships within your organization</p></div>', unsafe_allow_html=True)
     
     tab1, tab2, tab3 = st.tabs(["Network View", "Team Members", "Connections"])
+    team = repo.directory()
+    members = list(team)
     
     with tab1:
         st.subheader("Organization Network")
         
         # Create a simple network visualization using plotly
-        members_df = pd.DataFrame(st.session_state.team_members)
+        members_df = pd.DataFrame(members)
         
         # Department-based network
         fig = px.scatter(
@@ -652,7 +736,12 @@ def show_team_connections():
     with tab2:
         st.subheader("Team Member Details")
         
-        for member in st.session_state.team_members:
+        # Each department's names are collected once; a member's list skips
+        # themselves among the first few, so this stays linear in team size
+        department_names = {dept: [(m['id'], m['name']) for m in team.in_department(dept)]
+                            for dept in team.departments()}
+        
+        for member in members:
             with st.expander(f"{member['name']} - {member['role']}"):
                 col1, col2 = st.columns(2)
                 
@@ -668,9 +757,11 @@ def show_team_connections():
                 
                 # Show connections (simplified)
                 st.markdown("**Team Connections:**")
-                same_dept_members = [m['name'] for m in st.session_state.team_members if m['department'] == member['department'] and m['name'] != member['name']]
-                if same_dept_members:
-                    st.write(f"Works with: {', '.join(same_dept_members)}")
+                colleagues = department_names.get(member['department'], [])
+                shown = [name for member_id, name in colleagues[:WORKS_WITH_SHOWN + 1] if member_id != member['id']][:WORKS_WITH_SHOWN]
+                others = len(colleagues) - 1 - len(shown)  # colleagues includes the member
+                if shown:
+                    st.write(f"Works with: {', '.join(shown)}" + (f" and {others} more" if others > 0 else ""))
     
     with tab3:
         st.subheader("Manage Connections")
@@ -678,7 +769,7 @@ def show_team_connections():
         with st.form("add_connection"):
             col1, col2, col3 = st.columns(3)
             
-            worker_names = [m['name'] for m in st.session_state.team_members]
+            worker_names = [m['name'] for m in members]
             
             with col1:
                 from_worker = st.selectbox("From Worker", worker_names)
@@ -705,7 +796,7 @@ def show_workflow_builder():
                 st.session_state.show_workflow_form = True
         
         # Display workflows
-        for workflow in st.session_state.workflows:
+        for workflow in repo.workflows():
             with st.expander(f"{workflow['name']} - {workflow['category']}"):
                 col1, col2 = st.columns(2)
                 
@@ -755,7 +846,7 @@ def show_workflow_builder():
                             "created_at": datetime.now().strftime("%Y-%m-%d"),
                             "last_used": None
                         }
-                        st.session_state.workflows.append(new_workflow)
+                        repo.add_workflow(new_workflow)
                         st.session_state.show_workflow_form = False
                         st.success("Workflow created successfully!")
                         st.rerun()
@@ -765,7 +856,7 @@ def show_workflow_builder():
         st.info("Advanced workflow step builder - drag and drop interface for creating complex automated processes.")
         
         # Simplified workflow builder
-        selected_workflow = st.selectbox("Select Workflow to Edit", [w['name'] for w in st.session_state.workflows])
+        selected_workflow = st.selectbox("Select Workflow to Edit", [w['name'] for w in repo.workflows()])
         
         if selected_workflow:
             st.write(f"Editing: **{selected_workflow}**")
@@ -780,7 +871,7 @@ def show_workflow_builder():
                     step_type = st.selectbox("Step Type", step_types)
                 with col2:
                     step_description = st.text_area("Step Description")
-                    assigned_roles = st.multiselect("Assigned Roles", [m['role'] for m in st.session_state.team_members])
+                    assigned_roles = st.multiselect("Assigned Roles", repo.directory().roles())
                 
                 if st.form_submit_button("Add Step"):
                     st.success(f"Step '{step_name}' added to workflow '{selected_workflow}'")
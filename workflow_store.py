@@ -0,0 +1,421 @@
+# Shared storage for WorkFlow Hub (workflow.py)
+#
+# Departments, team members, reminders, workflows and chat messages live
+# once in SQLite instead of as a full copy in every browser session's
+# st.session_state. Pages go through the Repository, which filters in SQL
+# so each page loads only the rows it renders.
+#
+# Reads are cached per process and shared by all sessions. Every table has
+# a change counter bumped by triggers, so a cached result is reused until
+# that table is written -- by this process or any other.
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import date
+
+from search_index import SearchIndex
+from team_directory import TeamDirectory
+
+WORKFLOW_DB = os.environ.get('WORKFLOW_DB', 'workflow.db')
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+MAX_CACHED_QUERIES = 1024
+
+# Column order per table; JSON columns hold lists, BOOL columns 0/1
+TABLES = {
+    'departments': ('id', 'name', 'description', 'color'),
+    'team_members': ('id', 'name', 'role', 'department', 'email', 'level', 'status', 'skills',
+                     'completion_rate'),
+    'reminders': ('id', 'title', 'description', 'assigned_to', 'due_date', 'due_time', 'priority',
+                  'status', 'type', 'created_date', 'responses', 'completed_date'),
+    'workflows': ('id', 'name', 'description', 'category', 'is_active', 'trigger', 'steps',
+                  'created_at', 'last_used'),
+    'chat_messages': ('id', 'conversation', 'role', 'content'),
+}
+JSON_COLUMNS = {'skills', 'assigned_to'}
+
+# Searchable fields (with weights) and filterable facets per list
+MEMBER_SEARCH = ({'name': 3, 'role': 2, 'skills': 1}, ('department',))
+REMINDER_SEARCH = ({'title': 3, 'description': 1}, ('status',))
+BOOL_COLUMNS = {'is_active'}
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS departments (
+       id TEXT PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT, color TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS team_members (
+       id TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT, department TEXT, email TEXT,
+       level INTEGER, status TEXT, skills TEXT, completion_rate INTEGER)''',
+    "CREATE INDEX IF NOT EXISTS idx_members_department ON team_members(department)",
+    '''CREATE TABLE IF NOT EXISTS reminders (
+       id TEXT PRIMARY KEY, title TEXT NOT NULL, description TEXT, assigned_to TEXT,
+       due_date TEXT, due_time TEXT, priority TEXT, status TEXT, type TEXT,
+       created_date TEXT, responses INTEGER DEFAULT 0, completed_date TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(status, due_date)",
+    '''CREATE TABLE IF NOT EXISTS workflows (
+       id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT, category TEXT,
+       is_active INTEGER, "trigger" TEXT, steps INTEGER, created_at TEXT, last_used TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS chat_messages (
+       id INTEGER PRIMARY KEY AUTOINCREMENT, conversation TEXT NOT NULL,
+       role TEXT NOT NULL, content TEXT NOT NULL)''',
+    "CREATE INDEX IF NOT EXISTS idx_chat_conversation ON chat_messages(conversation, id)",
+    '''CREATE TABLE IF NOT EXISTS table_versions (
+       name TEXT PRIMARY KEY, version INTEGER NOT NULL)''',
+)
+
+# Dashboard aggregates
+#
+# Small summary tables kept current by triggers on every write, so the
+# dashboard reads a few rows instead of scanning members and reminders.
+# Each is backfilled once, when first created. Per aggregate: schema,
+# backfill, source table, the columns whose updates affect it, and the SQL
+# that adds or removes one source row ({row} is NEW or OLD).
+AGGREGATES = {
+    'department_stats': (
+        '''CREATE TABLE department_stats (department TEXT PRIMARY KEY,
+           members INTEGER NOT NULL, completion_total INTEGER NOT NULL)''',
+        '''INSERT INTO department_stats SELECT COALESCE(department, ''), COUNT(*),
+           COALESCE(SUM(completion_rate), 0) FROM team_members GROUP BY 1''',
+        'team_members', 'department, completion_rate',
+        '''INSERT INTO department_stats VALUES (COALESCE({row}.department, ''), 1,
+           COALESCE({row}.completion_rate, 0)) ON CONFLICT(department) DO UPDATE SET
+           members = members + 1, completion_total = completion_total + excluded.completion_total;''',
+        '''UPDATE department_stats SET members = members - 1,
+           completion_total = completion_total - COALESCE({row}.completion_rate, 0)
+           WHERE department = COALESCE({row}.department, '');
+           DELETE FROM department_stats WHERE members <= 0;'''),
+    'reminder_stats': (
+        "CREATE TABLE reminder_stats (status TEXT PRIMARY KEY, reminders INTEGER NOT NULL)",
+        "INSERT INTO reminder_stats SELECT COALESCE(status, ''), COUNT(*) FROM reminders GROUP BY 1",
+        'reminders', 'status',
+        '''INSERT INTO reminder_stats VALUES (COALESCE({row}.status, ''), 1)
+           ON CONFLICT(status) DO UPDATE SET reminders = reminders + 1;''',
+        "UPDATE reminder_stats SET reminders = reminders - 1 WHERE status = COALESCE({row}.status, '');"),
+    'completions': (
+        "CREATE TABLE completions (day TEXT PRIMARY KEY, completed INTEGER NOT NULL)",
+        '''INSERT INTO completions SELECT completed_date, COUNT(*) FROM reminders
+           WHERE completed_date IS NOT NULL GROUP BY 1''',
+        'reminders', 'completed_date',
+        '''INSERT INTO completions SELECT {row}.completed_date, 1 WHERE {row}.completed_date IS NOT NULL
+           ON CONFLICT(day) DO UPDATE SET completed = completed + 1;''',
+        "UPDATE completions SET completed = completed - 1 WHERE day = {row}.completed_date;"),
+}
+
+
+def init_aggregates(conn):
+    for name, (schema, backfill, source, columns, add, remove) in AGGREGATES.items():
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone():
+            conn.execute(schema)
+            conn.execute(backfill)
+        for event, body in (('INSERT', add.format(row='NEW')),
+                            ('DELETE', remove.format(row='OLD')),
+                            ('UPDATE OF ' + columns, remove.format(row='OLD') + add.format(row='NEW'))):
+            conn.execute("CREATE TRIGGER IF NOT EXISTS %s_%s AFTER %s ON %s BEGIN %s END"
+                         % (name, event.split()[0].lower(), event, source, body))
+
+
+def _encode(table, record):
+    values = []
+    for column in TABLES[table]:
+        value = record.get(column)
+        if column in JSON_COLUMNS:
+            value = json.dumps(value or [])
+        elif column in BOOL_COLUMNS:
+            value = int(bool(value))
+        values.append(value)
+    return values
+
+
+def _decode(table, row):
+    record = dict(zip(TABLES[table], row))
+    for column in JSON_COLUMNS.intersection(record):
+        record[column] = json.loads(record[column] or '[]')
+    for column in BOOL_COLUMNS.intersection(record):
+        record[column] = bool(record[column])
+    return record
+
+
+class Repository:
+    """Typed access to WorkFlow Hub data.
+
+    Lists returned by read methods are shared through the read cache: treat
+    them as read-only and write through the add_* / update_* methods.
+    """
+
+    def __init__(self, path=None, seed=None):
+        self.path = path or WORKFLOW_DB
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._views = {}  # name -> [table, version, object]
+        self._views_lock = threading.RLock()
+        self.init_db(seed)
+
+    # Connections: one per thread (Streamlit runs each session on its own)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def init_db(self, seed=None):
+        conn = self._conn()
+        with conn:
+            # Databases created before reminders tracked completion
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(reminders)")}
+            if columns and 'completed_date' not in columns:
+                conn.execute("ALTER TABLE reminders ADD COLUMN completed_date TEXT")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            for table in TABLES:
+                conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute('''CREATE TRIGGER IF NOT EXISTS %s_version_%s AFTER %s ON %s BEGIN
+                                    UPDATE table_versions SET version = version + 1 WHERE name = '%s';
+                                    END''' % (table, event.lower(), event, table, table))
+            init_aggregates(conn)
+        if seed:
+            # Sample data for a brand-new database; the immediate transaction
+            # stops two starting processes from both seeding it
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if not conn.execute("SELECT 1 FROM departments UNION ALL SELECT 1 FROM team_members").fetchone():
+                    for table, records in seed.items():
+                        conn.executemany(self._insert_sql(table), [_encode(table, r) for r in records])
+
+    # Cached reads
+
+    def version(self, table):
+        return self._conn().execute("SELECT version FROM table_versions WHERE name=?", (table,)).fetchone()[0]
+
+    def _read(self, table, sql, params=(), decode=True):
+        version = self.version(table)
+        key = (sql, tuple(params))
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = self._conn().execute(sql, params).fetchall()
+        result = [_decode(table, row) for row in rows] if decode else rows
+        with self._cache_lock:
+            if len(self._cache) >= MAX_CACHED_QUERIES:
+                self._cache.clear()
+            self._cache[key] = (version, result)
+        return result
+
+    def _select(self, table, where='', params=(), order='rowid', limit=None, offset=0):
+        columns = ', '.join('"%s"' % c for c in TABLES[table])
+        sql = "SELECT %s FROM %s%s ORDER BY %s" % (columns, table, ' WHERE ' + where if where else '', order)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = tuple(params) + (limit, offset)
+        return self._read(table, sql, params)
+
+    def _get(self, table, record_id):
+        # Uncached single-row read, used to patch in-memory views
+        columns = ', '.join('"%s"' % c for c in TABLES[table])
+        row = self._conn().execute("SELECT %s FROM %s WHERE id=?" % (columns, table), (record_id,)).fetchone()
+        return None if row is None else _decode(table, row)
+
+    def _rows(self, table):
+        # Uncached full scan, used to build in-memory views
+        columns = ', '.join('"%s"' % c for c in TABLES[table])
+        for row in self._conn().execute("SELECT %s FROM %s ORDER BY rowid" % (columns, table)):
+            yield _decode(table, row)
+
+    def _count(self, table, where='', params=()):
+        sql = "SELECT COUNT(*) FROM %s%s" % (table, ' WHERE ' + where if where else '')
+        return self._read(table, sql, params, decode=False)[0][0]
+
+    # In-memory views (team directory, search indexes)
+    #
+    # Built from a table once per process. Writes through this repository
+    # patch them in place; a view is rebuilt only when its table's change
+    # counter shows a write from elsewhere.
+
+    def _view(self, name, table, build, patch):
+        """Return view `name`, building it if needed.
+
+        patch(view, record_id, row) applies one written row (None if deleted).
+        """
+        version = self.version(table)
+        with self._views_lock:
+            view = self._views.get(name)
+            if view is None or view[1] != version:
+                view = self._views[name] = [table, version, build(), patch]
+            return view[2]
+
+    def _write(self, table, write):
+        """Run write(), which returns the id it wrote, and patch the table's views."""
+        with self._views_lock:
+            record_id = write()
+            version = self.version(table)
+            views = [v for v in self._views.values() if v[0] == table]
+            # Patch only if this write was the table's only change since the
+            # view was built; otherwise it is rebuilt on next read
+            if any(version == v[1] + 1 for v in views):
+                row = self._get(table, record_id)
+                for view in views:
+                    if version == view[1] + 1:
+                        view[3](view[2], record_id, row)
+                        view[1] = version
+        return record_id
+
+    def _search_view(self, name, table, spec):
+        fields, facets = spec
+
+        def build():
+            index = SearchIndex(fields, facets)
+            for row in self._rows(table):
+                index.add(row['id'], row)
+            return index
+
+        return self._view(name, table, build,
+                          lambda index, record_id, row: index.update(record_id, row) if row else index.remove(record_id))
+
+    # Writes
+
+    @staticmethod
+    def _insert_sql(table):
+        columns = TABLES[table]
+        return "INSERT INTO %s (%s) VALUES (%s)" % (
+            table, ', '.join('"%s"' % c for c in columns), ', '.join('?' * len(columns)))
+
+    def _insert(self, table, record):
+        record = dict(record)
+        record.setdefault('id', str(uuid.uuid4()))
+        with self._conn() as conn:
+            conn.execute(self._insert_sql(table), _encode(table, record))
+        return record
+
+    def _update(self, table, record_id, changes):
+        assignments = ', '.join('"%s"=?' % c for c in changes)
+        encoded = dict(zip(TABLES[table], _encode(table, changes)))
+        with self._conn() as conn:
+            conn.execute("UPDATE %s SET %s WHERE id=?" % (table, assignments),
+                         [encoded[c] for c in changes] + [record_id])
+        return record_id
+
+    # Departments
+
+    def departments(self):
+        return self._select('departments')
+
+    def add_department(self, department):
+        return self._insert('departments', department)
+
+    # Team members
+
+    def members(self, department=None, status=None):
+        where, params = [], []
+        if department is not None:
+            where.append("department=?")
+            params.append(department)
+        if status is not None:
+            where.append("status=?")
+            params.append(status)
+        return self._select('team_members', ' AND '.join(where), params)
+
+    def directory(self):
+        """The whole team as an indexed TeamDirectory (see team_directory.py)."""
+        return self._view('directory', 'team_members', lambda: TeamDirectory(self._rows('team_members')),
+                          lambda directory, member_id, row: directory.add(row) if row else directory.remove(member_id))
+
+    def member_search(self):
+        """SearchIndex over member names, roles and skills (see search_index.py)."""
+        return self._search_view('member_search', 'team_members', MEMBER_SEARCH)
+
+    def add_member(self, member):
+        member = dict(member)
+        member.setdefault('id', str(uuid.uuid4()))
+        self._write('team_members', lambda: self._insert('team_members', member)['id'])
+        return member
+
+    def update_member(self, member_id, **changes):
+        self._write('team_members', lambda: self._update('team_members', member_id, changes))
+
+    # Reminders
+
+    def reminders(self, status=None, limit=None, offset=0):
+        if status is None:
+            return self._select('reminders', limit=limit, offset=offset)
+        return self._select('reminders', "status=?", (status,), limit=limit, offset=offset)
+
+    def reminder_count(self, status=None):
+        counts = self.reminder_status_counts()
+        return sum(counts.values()) if status is None else counts.get(status, 0)
+
+    def reminders_by_id(self, reminder_ids):
+        """Reminders for the given ids (e.g. one page of search results), in that order."""
+        if not reminder_ids:
+            return []
+        columns = ', '.join('"%s"' % c for c in TABLES['reminders'])
+        rows = self._conn().execute("SELECT %s FROM reminders WHERE id IN (%s)" % (
+            columns, ', '.join('?' * len(reminder_ids))), list(reminder_ids)).fetchall()
+        by_id = {row[0]: _decode('reminders', row) for row in rows}
+        return [by_id[i] for i in reminder_ids if i in by_id]
+
+    def reminder_search(self):
+        """SearchIndex over reminder titles and descriptions (see search_index.py)."""
+        return self._search_view('reminder_search', 'reminders', REMINDER_SEARCH)
+
+    def add_reminder(self, reminder):
+        reminder = dict(reminder)
+        reminder.setdefault('id', str(uuid.uuid4()))
+        self._write('reminders', lambda: self._insert('reminders', reminder)['id'])
+        return reminder
+
+    def update_reminder(self, reminder_id, **changes):
+        self._write('reminders', lambda: self._update('reminders', reminder_id, changes))
+
+    def complete_reminder(self, reminder_id, day=None):
+        self.update_reminder(reminder_id, status='completed', completed_date=day or date.today().isoformat())
+
+    # Dashboard aggregates (see AGGREGATES)
+
+    def department_stats(self):
+        """[(department, members, average completion rate)], largest department first."""
+        rows = self._read('team_members', "SELECT department, members, completion_total FROM department_stats "
+                                          "ORDER BY members DESC, department", decode=False)
+        return [(department, members, total / members) for department, members, total in rows]
+
+    def reminder_status_counts(self):
+        return dict(self._read('reminders', "SELECT status, reminders FROM reminder_stats", decode=False))
+
+    def completed_on(self, day):
+        rows = self._read('reminders', "SELECT completed FROM completions WHERE day=?", (day,), decode=False)
+        return rows[0][0] if rows else 0
+
+    def active_due_count(self, day, overdue=False):
+        """Active reminders due on `day`, or on or before it with overdue=True."""
+        return self._count('reminders', "status='active' AND due_date%s?" % ('<=' if overdue else '='), (day,))
+
+    # Workflows
+
+    def workflows(self):
+        return self._select('workflows')
+
+    def add_workflow(self, workflow):
+        return self._insert('workflows', workflow)
+
+    # Chat (one conversation per browser session)
+
+    def chat_messages(self, conversation):
+        # Per-session data: read directly rather than filling the shared cache
+        rows = self._conn().execute("SELECT id, conversation, role, content FROM chat_messages "
+                                    "WHERE conversation=? ORDER BY id", (conversation,)).fetchall()
+        return [_decode('chat_messages', row) for row in rows]
+
+    def add_chat_message(self, conversation, role, content):
+        with self._conn() as conn:
+            conn.execute("INSERT INTO chat_messages (conversation, role, content) VALUES (?,?,?)",
+                         (conversation, role, content))
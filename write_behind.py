@@ -0,0 +1,139 @@
+# Write-behind queue for the farmers Q&A app
+#
+# Routes enqueue their INSERT/UPDATE instead of committing on the request
+# thread. A single background writer drains the queue and commits up to
+# `max_batch` writes in one transaction, at most `flush_interval` seconds
+# after the first one arrived, so bursts of submissions no longer fight over
+# SQLite's writer lock.
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import db
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    def __init__(self, flush_interval=0.05, max_batch=500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        # Writes per user not yet committed, for read-your-writes
+        self._pending = defaultdict(int)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=(), user_id=None, on_commit=None):
+        """Queue one write statement on behalf of user_id.
+
+        on_commit(lastrowid) is called from the writer thread once the
+        statement's transaction has committed.
+        """
+        if self._closed:
+            # After shutdown started, fall back to a synchronous write
+            lastrowid = db.execute(sql, params)
+            if on_commit:
+                on_commit(lastrowid)
+            return
+        with self._cond:
+            self._pending[user_id] += 1
+        self._queue.put((sql, params, user_id, on_commit))
+
+    def wait_for(self, user_id, timeout=5.0):
+        """Block until every write submitted by user_id is committed."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending.get(user_id), timeout)
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        self._queue.join()
+
+    def close(self):
+        """Flush outstanding writes and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        # Block for the first write, then gather more until the batch is full
+        # or the flush interval has elapsed.
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        writes = []
+        while True:
+            try:
+                writes.append(self._queue.get_nowait())
+            except queue.Empty:
+                return writes
+
+    def _run(self):
+        stop = False
+        while not stop:
+            writes = self._collect()
+            if writes[-1] is _STOP:
+                # Anything still queued behind the stop marker is flushed too
+                stop = True
+                writes.pop()
+                writes += self._drain()
+            try:
+                if writes:
+                    self._commit(writes)
+            finally:
+                with self._cond:
+                    for _, _, user_id, _ in writes:
+                        self._pending[user_id] -= 1
+                        if not self._pending[user_id]:
+                            del self._pending[user_id]
+                    self._cond.notify_all()
+                for _ in range(len(writes) + stop):
+                    self._queue.task_done()
+
+    def _commit(self, writes):
+        conn = db.get_conn()
+        committed = []
+        try:
+            start = time.perf_counter()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                locked = time.perf_counter()
+                for sql, params, _, on_commit in writes:
+                    committed.append((on_commit, conn.execute(sql, params).lastrowid))
+            db.trace('lock_wait', 'write-behind batch', locked - start)
+            db.trace('execute', 'write-behind batch', time.perf_counter() - locked, len(writes))
+        except sqlite3.Error:
+            # One bad statement must not drop the rest of the batch
+            log.exception("write-behind batch of %d failed, retrying one by one", len(writes))
+            committed = []
+            for sql, params, _, on_commit in writes:
+                try:
+                    with conn:
+                        committed.append((on_commit, conn.execute(sql, params).lastrowid))
+                except sqlite3.Error:
+                    log.exception("write-behind dropped statement: %s %r", sql, params)
+        for on_commit, lastrowid in committed:
+            if on_commit:
+                try:
+                    on_commit(lastrowid)
+                except Exception:
+                    log.exception("write-behind on_commit callback failed")